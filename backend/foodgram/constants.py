@@ -1,4 +1,5 @@
 PAGE_SIZE = 6
+MAX_PAGE_SIZE = 100
 MAX_LENGHT_NAME = 200
 MAX_LENGHT_COLOR = 7
 MAX_LENGHT_SLUG = 200
@@ -9,3 +10,33 @@ MIN_LIMIT_COOKING_TIME = 1
 MAX_LIMIT_COOKING_TIME = 2147483647
 MIN_LIMIT_AMOUNT = 1
 MAX_LIMIT_AMOUNT = 2147483647
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60
+SHOPPING_CART_CHUNK_SIZE = 8192
+PDF_FONT_SIZE = 14
+INGREDIENTS_SEARCH_LIMIT = 50
+POPULAR_FAVORITE_WEIGHT = 2
+POPULAR_SHOPPING_CART_WEIGHT = 1
+RECIPES_LIST_CACHE_TIMEOUT = 5 * 60
+SEARCH_CONFIG = 'russian'
+SEARCH_NAME_WEIGHT = 2
+SEARCH_TEXT_WEIGHT = 1
+RECIPE_CHANGES_LOG_SIZE = 10000
+RECIPE_CHANGES_LOG_OVERLAP = 100
+SIMILAR_RECIPES_LIMIT = 20
+RECOMMENDED_RECIPES_LIMIT = 50
+RECOMMENDATION_FAVORITE_WEIGHT = 2
+RECOMMENDATION_SHOPPING_CART_WEIGHT = 1
+RECOMMENDATION_SUBSCRIPTION_BOOST = 0.5
+RECOMMENDATION_MAX_USER_RECIPES = 500
+FEED_FANOUT_LIMIT = 10000
+FEED_PUSH_LIMIT = 8000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 100
+IMAGE_MAX_BYTES = 5 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_VARIANTS = (('card', 480), ('detail', 960), ('retina', 1920))
+IMAGE_VARIANTS_DIR = 'variants'
+IMAGE_JPEG_QUALITY = 85
+IMAGE_WEBP_QUALITY = 80
+MEDIA_GC_BATCH_SIZE = 1000
+MEDIA_GC_MIN_AGE_HOURS = 24
@@ -0,0 +1,87 @@
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import (IsolationLevel,
+                                                       is_psycopg3)
+
+_pools = {}
+_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend taking connections from psycopg pool shared by
+    all threads of process. Pool is enabled by OPTIONS['pool'] with
+    arguments of psycopg_pool.ConnectionPool (or True for defaults),
+    then connection is returned to pool instead of being closed, so
+    CONN_MAX_AGE must be 0. Without OPTIONS['pool'] backend works like
+    the built-in one.
+    """
+    def get_pool_options(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        if not is_psycopg3:
+            raise ImproperlyConfigured('Пул соединений требует psycopg 3.')
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured(
+                'Пул соединений не совместим с CONN_MAX_AGE, отличным от 0.')
+        return {} if options is True else dict(options)
+
+    @property
+    def pool(self):
+        # Databases are created and dropped without pool.
+        if self.alias == NO_DB_ALIAS:
+            return None
+        options = self.get_pool_options()
+        if options is None:
+            return None
+        with _lock:
+            if self.alias not in _pools:
+                from psycopg_pool import ConnectionPool
+
+                if self.settings_dict['CONN_HEALTH_CHECKS']:
+                    options.setdefault(
+                        'check', ConnectionPool.check_connection)
+                kwargs = self.get_connection_params()
+                # Django sets autocommit of every taken connection itself.
+                kwargs['autocommit'] = True
+                _pools[self.alias] = ConnectionPool(
+                    kwargs=kwargs, name=self.alias, open=True, **options)
+            return _pools[self.alias]
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = IsolationLevel(options.get(
+            'isolation_level', IsolationLevel.READ_COMMITTED))
+        connection = pool.getconn()
+        if 'isolation_level' in options:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            self.pool.putconn(self.connection)
+        self.connection = None
+
+
+def get_pool_stats():
+    """
+    Function for getting statistics of connection pools of process
+    by database aliases.
+    """
+    with _lock:
+        pools = dict(_pools)
+    return {alias: pool.get_stats() for alias, pool in pools.items()}
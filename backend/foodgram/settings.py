@@ -3,6 +3,8 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
+from foodgram.constants import IMAGE_MAX_BYTES
+
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,6 +46,14 @@ MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# Serve hot read endpoints with async views, requires ASGI server
+
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
+if ASYNC_READ_VIEWS:
+    # Sync-only middleware would run every async view in a thread
+    MIDDLEWARE.remove('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -65,17 +75,38 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 
+# Connections are either kept by every thread for CONN_MAX_AGE seconds
+# or taken from pool shared by threads of worker process. Every worker
+# opens up to DATABASE_POOL_MAX_SIZE connections, so workers multiplied
+# by this size must stay below max_connections of PostgreSQL.
+# Async views run queries in short-lived threads, so under ASGI
+# connections are not persistent by default and pool should be used.
+
+DATABASE_POOL = os.getenv('DATABASE_POOL', 'False') == 'True'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram.db',
         'NAME': os.getenv('DATABASE_NAME'),
         'USER': os.getenv('DATABASE_USER'),
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
         'HOST': os.getenv('DATABASE_HOST'),
         'PORT': os.getenv('DATABASE_PORT'),
+        'CONN_MAX_AGE': (
+            0 if DATABASE_POOL else int(os.getenv(
+                'CONN_MAX_AGE', 0 if ASYNC_READ_VIEWS else 60))),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+if DATABASE_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', 10)),
+        'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', 10)),
+    }
+
 AUTH_USER_MODEL = "users.User"
 
 # Password validation
@@ -121,6 +152,25 @@ REST_FRAMEWORK = {
 }
 
 
+# Cache
+# Local memory cache is kept per process, file-based cache is shared
+# between processes of one host. Cached data is keyed by versions kept
+# in the database, so every process sees invalidation at once with any
+# backend, a shared backend only avoids rebuilding data per process.
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -142,8 +192,33 @@ MEDIA_ROOT = BASE_DIR / 'media'
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'static'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'foodgram.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Serve ingredients from in-memory catalogue instead of the database
+
+INGREDIENTS_CATALOGUE_CACHE = (
+    os.getenv('INGREDIENTS_CATALOGUE_CACHE', 'True') == 'True')
+
+
+# Recipe images are sent in base64 inside JSON, body must fit the largest one
+
+DATA_UPLOAD_MAX_MEMORY_SIZE = IMAGE_MAX_BYTES * 4 // 3 + 1024 * 1024
+
+
+# Number of threads generating image variants, 0 generates them in request
+
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
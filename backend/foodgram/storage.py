@@ -0,0 +1,43 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Storage for naming files by sha256 of their content.
+    Identical files are stored once under name
+    '<directory>/<first two chars of hash>/<hash><extension>',
+    so files are never overwritten and may be shared by several objects.
+    Unreferenced files are removed by command 'collect_orphan_media'.
+    """
+    chunk_size = 64 * 1024
+
+    def get_content_name(self, name, content):
+        content.seek(0)
+        digest = hashlib.sha256()
+        for chunk in content.chunks(self.chunk_size):
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        content_hash = digest.hexdigest()
+        return posixpath.join(
+            directory, content_hash[:2], content_hash + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        try:
+            # Reused file becomes recent, so it is not collected
+            # while recipe referencing it is being saved.
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super().save(name, content, max_length)
+        return name
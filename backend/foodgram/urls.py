@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from foodgram.views import database_stats
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('recipes.urls')),
     path('api/', include('users.urls')),
+    path('api/database-stats/', database_stats, name='database_stats'),
     path('debug/', include('debug_toolbar.urls')),
 ]
@@ -0,0 +1,28 @@
+import os
+
+from django.db import connections
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from foodgram.db.base import get_pool_stats
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def database_stats(request):
+    """
+    Function for getting settings of database connections and statistics
+    of connection pools of worker process which serves the request.
+    """
+    pool_stats = get_pool_stats()
+    return Response({
+        'pid': os.getpid(),
+        'databases': {
+            alias: {
+                'conn_max_age': connections[alias].settings_dict[
+                    'CONN_MAX_AGE'],
+                'conn_health_checks': connections[alias].settings_dict[
+                    'CONN_HEALTH_CHECKS'],
+                'pool': pool_stats.get(alias),
+            } for alias in connections}})
@@ -3,7 +3,7 @@ from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
-                            Recipe, ShoppingCart, Tag)
+                            PopularRecipe, Recipe, ShoppingCart, Tag)
 
 
 class IngredientResource(resources.ModelResource):
@@ -16,9 +16,10 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'author', 'author_id', 'favorite_recipes')
     list_filter = ('author', 'name', 'tags')
 
-    @admin.display(description='Количество рецептов в Избранном')
+    @admin.display(description='Количество рецептов в Избранном',
+                   ordering='favorites_count')
     def favorite_recipes(self, obj: Recipe):
-        return obj.favorite_recipe.count()
+        return obj.favorites_count
 
 
 @admin.register(Ingredient)
@@ -48,3 +49,11 @@ class FavoriteRecipeAdmin(admin.ModelAdmin):
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('id', 'recipe', 'user')
     list_filter = ('recipe', 'user')
+
+
+@admin.register(PopularRecipe)
+class PopularRecipeAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'score', 'favorites_count',
+                    'shopping_cart_count', 'refreshed_at')
+    readonly_fields = ('recipe', 'score', 'favorites_count',
+                       'shopping_cart_count', 'refreshed_at')
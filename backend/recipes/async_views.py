@@ -0,0 +1,192 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+
+from foodgram.constants import INGREDIENTS_SEARCH_LIMIT
+from recipes.catalogue import get_ingredients_catalogue
+from recipes.filters import IngredientFilter
+from recipes.models import Recipe, Tag
+from recipes.serializers import RecipeRetrieveSerializer, TagSerializer
+from recipes.views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+SYNC_PARAMS = ('format', 'cursor')
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data, status=status, safe=False,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def error_response(exception):
+    detail = exception.detail
+    if not isinstance(detail, (list, dict)):
+        detail = {'detail': detail}
+    response = json_response(detail, status=exception.status_code)
+    if exception.status_code == 401:
+        response['WWW-Authenticate'] = (
+            TokenAuthentication().authenticate_header(None))
+    return response
+
+
+def authenticate(request):
+    """
+    Function for authenticating request by token like API views do.
+    """
+    user_auth = TokenAuthentication().authenticate(request)
+    request.user = user_auth[0] if user_auth else AnonymousUser()
+    return request.user
+
+
+def get_view(sync_view, request, *args, **kwargs):
+    """
+    Function for creating instance of DRF view of 'sync_view' for GET
+    request like as_view() does, so async handlers share its ETag,
+    Last-Modified and cache methods.
+    """
+    view = sync_view.cls(**sync_view.initkwargs)
+    view.action_map = sync_view.actions
+    view.action = sync_view.actions['get']
+    view.request = request
+    view.args = args
+    view.kwargs = kwargs
+    view.format_kwarg = None
+    return view
+
+
+def get_validators(view, request, *args, **kwargs):
+    authenticate(request)
+    request.accepted_renderer = JSONRenderer()
+    return view.get_validators(request, *args, **kwargs)
+
+
+def async_read_view(handler, sync_view):
+    """
+    Function for creating async view which serves GET requests with
+    'handler' and other requests with DRF view 'sync_view' in a thread.
+    Requests with parameters from SYNC_PARAMS are served by 'sync_view'
+    too. If 'handler' returns None the request is served by 'sync_view'.
+    Conditional requests are answered with the validators of
+    'sync_view', so both views return the same ETag and Last-Modified.
+    """
+    async_sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if (request.method != 'GET'
+                or any(param in request.GET for param in SYNC_PARAMS)):
+            return await async_sync_view(request, *args, **kwargs)
+        drf_view = get_view(sync_view, request, *args, **kwargs)
+        try:
+            etag, last_modified = await sync_to_async(get_validators)(
+                drf_view, request, *args, **kwargs)
+            response = None
+            if etag is not None:
+                response = get_conditional_response(
+                    request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await handler(drf_view, request, *args, **kwargs)
+        except APIException as exception:
+            return error_response(exception)
+        if response is None:
+            return await async_sync_view(request, *args, **kwargs)
+        if etag is not None and response.status_code in (200, 304):
+            drf_view.add_validators(response, etag, last_modified)
+        return response
+
+    view.csrf_exempt = True
+    return view
+
+
+def paginate_recipes(view, request):
+    """
+    Function for getting page of recipes with filters and paginator
+    of 'view', so both views return the same pages, links and errors.
+    """
+    drf_request = view.initialize_request(request)
+    drf_request.user = request.user
+    view.request = drf_request
+    return view.paginate_queryset(view.filter_queryset(view.get_queryset()))
+
+
+async def recipe_list(view, request):
+    """
+    Function for getting page of recipes.
+    Page is fetched by RecipeViewSet in a thread and serialized from
+    prefetched data, pages for anonymous users are shared with it
+    through the cache.
+    """
+    if not request.user.is_authenticated:
+        key = await sync_to_async(view.get_list_cache_key)(request)
+        data = await cache.aget(key)
+        if data is not None:
+            return json_response(data)
+    page = await sync_to_async(paginate_recipes)(view, request)
+    serializer = RecipeRetrieveSerializer(
+        page, many=True, context=view.get_serializer_context())
+    data = view.get_paginated_response(serializer.data).data
+    if not request.user.is_authenticated:
+        await cache.aset(key, data, view.list_cache_timeout)
+    return json_response(data)
+
+
+async def recipe_detail(view, request, pk):
+    recipe = await Recipe.objects.with_related(
+        request.user).filter(pk=pk).afirst()
+    if recipe is None:
+        raise NotFound
+    serializer = RecipeRetrieveSerializer(
+        recipe, context={'request': request})
+    return json_response(serializer.data)
+
+
+async def tag_list(view, request):
+    tags = [tag async for tag in Tag.objects.all()]
+    return json_response(TagSerializer(tags, many=True).data)
+
+
+async def tag_detail(view, request, pk):
+    tag = await Tag.objects.filter(pk=pk).afirst()
+    if tag is None:
+        raise NotFound
+    return json_response(TagSerializer(tag).data)
+
+
+async def ingredient_list(view, request):
+    if not settings.INGREDIENTS_CATALOGUE_CACHE:
+        return None
+    catalogue = await sync_to_async(get_ingredients_catalogue)()
+    name = request.GET.get(IngredientFilter.search_param, '').strip()
+    if not name:
+        return json_response(catalogue.all(INGREDIENTS_SEARCH_LIMIT))
+    ranked = request.GET.get(IngredientFilter.mode_param) == 'ranked'
+    return json_response(
+        catalogue.search(name, ranked, INGREDIENTS_SEARCH_LIMIT))
+
+
+async def ingredient_detail(view, request, pk):
+    if not settings.INGREDIENTS_CATALOGUE_CACHE:
+        return None
+    catalogue = await sync_to_async(get_ingredients_catalogue)()
+    ingredient = catalogue.get(pk)
+    if ingredient is None:
+        raise NotFound
+    return json_response(ingredient)
+
+
+recipes = async_read_view(recipe_list, RecipeViewSet.as_view(
+    {'get': 'list', 'post': 'create'}))
+recipe = async_read_view(recipe_detail, RecipeViewSet.as_view(
+    {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update',
+     'delete': 'destroy'}))
+tags = async_read_view(tag_list, TagViewSet.as_view({'get': 'list'}))
+tag = async_read_view(tag_detail, TagViewSet.as_view({'get': 'retrieve'}))
+ingredients = async_read_view(
+    ingredient_list, IngredientViewSet.as_view({'get': 'list'}))
+ingredient = async_read_view(
+    ingredient_detail, IngredientViewSet.as_view({'get': 'retrieve'}))
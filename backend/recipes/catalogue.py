@@ -0,0 +1,462 @@
+import re
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from functools import partial
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from foodgram.constants import (RECIPE_CHANGES_LOG_OVERLAP,
+                                RECIPE_CHANGES_LOG_SIZE, SEARCH_NAME_WEIGHT,
+                                SEARCH_TEXT_WEIGHT)
+from recipes.models import (CatalogueVersion, Ingredient, IngredientInRecipe,
+                            Recipe, RecipeChange, Tag)
+
+VERSION_KEY = 'version:{}'
+TAGS_MAP_KEY = 'tags_map:{}'
+WORD = re.compile(r'\w+')
+INGREDIENTS = 'ingredients'
+TAGS = 'tags'
+RECIPES = 'recipes'
+
+
+def user_version(user_id):
+    """
+    Function for getting name of version of user's favorites,
+    shopping cart and subscriptions.
+    """
+    return f'user:{user_id}'
+
+
+def get_versions(*names):
+    """
+    Function for getting current versions of catalogues 'names' with
+    one query. Versions are kept in the database, so they are bumped
+    for all processes at once.
+    """
+    versions = dict(CatalogueVersion.objects.filter(
+        name__in=names).values_list('name', 'version'))
+    missing = [name for name in names if name not in versions]
+    if missing:
+        CatalogueVersion.objects.bulk_create(
+            [CatalogueVersion(name=name, version=uuid4().hex)
+             for name in missing],
+            ignore_conflicts=True)
+        versions.update(CatalogueVersion.objects.filter(
+            name__in=missing).values_list('name', 'version'))
+    return [versions[name] for name in names]
+
+
+def get_version(name):
+    """
+    Function for getting current version of catalogue 'name'.
+    """
+    return get_versions(name)[0]
+
+
+def get_request_versions(request, *names):
+    """
+    Function for getting versions of catalogues 'names' read once per
+    request, so ETag and cache key of a response share one query.
+    """
+    versions = getattr(request, 'catalogue_versions', None)
+    if versions is None:
+        versions = request.catalogue_versions = {}
+    missing = [name for name in names if name not in versions]
+    if missing:
+        versions.update(zip(missing, get_versions(*missing)))
+    return [versions[name] for name in names]
+
+
+def bump_version(name):
+    """
+    Function for invalidating catalogue 'name' and responses built from it.
+    Returns new version.
+    """
+    version = uuid4().hex
+    if not CatalogueVersion.objects.filter(name=name).update(
+            version=version):
+        CatalogueVersion.objects.bulk_create(
+            [CatalogueVersion(name=name, version=version)],
+            ignore_conflicts=True)
+        CatalogueVersion.objects.filter(name=name).update(version=version)
+    return version
+
+
+def bump_version_on_commit(name):
+    """
+    Function for invalidating catalogue 'name' after current transaction
+    is committed, so responses are not cached with uncommitted data.
+    """
+    transaction.on_commit(partial(bump_version, name))
+
+
+def get_tags_map():
+    """
+    Function for getting dict of tags ids by slugs.
+    Map is cached under current version of tags, so it is rebuilt
+    with one query after tags are changed.
+    """
+    key = TAGS_MAP_KEY.format(get_version(TAGS))
+    tags_map = cache.get(key)
+    if tags_map is None:
+        tags_map = dict(Tag.objects.order_by().values_list('slug', 'id'))
+        cache.set(key, tags_map, None)
+    return tags_map
+
+
+class IngredientCatalogue:
+    """
+    Class for compact read-only copy of Ingredient table.
+    Ingredients are stored in parallel tuples sorted by casefolded name,
+    ids are stored in sorted array for binary search.
+    """
+    __slots__ = ('version', 'ids', 'names', 'units', 'keys',
+                 'sorted_ids', 'positions')
+
+    def __init__(self, version, rows):
+        rows = sorted(rows, key=lambda row: (row[1].casefold(), row[0]))
+        self.version = version
+        self.ids = array('q', (row[0] for row in rows))
+        self.names = tuple(row[1] for row in rows)
+        self.units = tuple(sys.intern(row[2]) for row in rows)
+        self.keys = tuple(name.casefold() for name in self.names)
+        order = sorted(range(len(rows)), key=self.ids.__getitem__)
+        self.sorted_ids = array('q', (self.ids[i] for i in order))
+        self.positions = array('l', order)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, ingredient_id):
+        return self.position(ingredient_id) is not None
+
+    def position(self, ingredient_id):
+        index = bisect_left(self.sorted_ids, ingredient_id)
+        if (index < len(self.sorted_ids)
+                and self.sorted_ids[index] == ingredient_id):
+            return self.positions[index]
+        return None
+
+    def item(self, position):
+        return {'id': self.ids[position], 'name': self.names[position],
+                'measurement_unit': self.units[position]}
+
+    def get(self, ingredient_id):
+        """
+        Method for getting ingredient as dict or None.
+        """
+        position = self.position(ingredient_id)
+        return None if position is None else self.item(position)
+
+    def get_instance(self, ingredient_id):
+        """
+        Method for getting ingredient as Ingredient instance or None.
+        """
+        item = self.get(ingredient_id)
+        return None if item is None else Ingredient(**item)
+
+    def all(self, limit=None):
+        return [self.item(position)
+                for position in range(len(self.ids))[:limit]]
+
+    def search(self, name, ranked=False, limit=None):
+        """
+        Method for searching ingredients by beginning of name.
+        If 'ranked' ingredients containing the name are added after them.
+        """
+        name = name.casefold()
+        positions = []
+        start = bisect_left(self.keys, name)
+        for position in range(start, len(self.keys)):
+            if (not self.keys[position].startswith(name)
+                    or len(positions) == limit):
+                break
+            positions.append(position)
+        if ranked:
+            for position, key in enumerate(self.keys):
+                if len(positions) == limit:
+                    break
+                if name in key and not key.startswith(name):
+                    positions.append(position)
+        return [self.item(position) for position in positions]
+
+
+_catalogue = None
+_lock = threading.Lock()
+
+
+def get_ingredients_catalogue():
+    """
+    Function for getting process-local ingredients catalogue.
+    Catalogue is reloaded with one query when its version is changed.
+    """
+    global _catalogue
+    version = get_version(INGREDIENTS)
+    catalogue = _catalogue
+    if catalogue is not None and catalogue.version == version:
+        return catalogue
+    with _lock:
+        if _catalogue is None or _catalogue.version != version:
+            _catalogue = IngredientCatalogue(
+                version, Ingredient.objects.order_by().values_list(
+                    'id', 'name', 'measurement_unit'))
+        return _catalogue
+
+
+def tokenize(text):
+    return [word.casefold() for word in WORD.findall(text)]
+
+
+class RecipeChangesIndex:
+    """
+    Base class for in-memory indexes of recipes kept up to date with
+    RecipeChange log. 'version' is id of the last applied entry of
+    the log, 'applied' keeps ids of recent entries because entries
+    of long transactions may appear with smaller ids.
+    """
+    __slots__ = ('version', 'applied')
+
+    def __init__(self, version, applied):
+        self.version = version
+        self.applied = set(applied)
+
+    @staticmethod
+    def get_rows(recipe_ids=None):
+        """
+        Method for getting rows (recipe id, *values) of indexed data
+        of all recipes or of 'recipe_ids'.
+        """
+        raise NotImplementedError
+
+    def set_recipe(self, recipe_id, rows):
+        """
+        Method for replacing indexed data of recipe with 'rows',
+        empty 'rows' removes recipe from index.
+        """
+        raise NotImplementedError
+
+    def apply(self, changes):
+        """
+        Method for applying entries (id, recipe id) of change log
+        with data of changed recipes read by one query.
+        """
+        rows = {recipe_id: [] for _, recipe_id in changes}
+        for recipe_id, *values in self.get_rows(list(rows)):
+            rows[recipe_id].append(values)
+        for recipe_id, recipe_rows in rows.items():
+            self.set_recipe(recipe_id, recipe_rows)
+        self.applied.update(change_id for change_id, _ in changes)
+        self.version = max(self.applied)
+        self.applied = {change_id for change_id in self.applied
+                        if change_id > self.version
+                        - RECIPE_CHANGES_LOG_OVERLAP}
+
+
+class RecipeSearchIndex(RecipeChangesIndex):
+    """
+    Class for in-memory inverted index of recipes by words of name
+    and text. It is used for full-text search on databases other than
+    Postgres. Words of name weigh more than words of text.
+    Postings are changed in place, search only copies them or reads
+    single keys, so it does not need the lock.
+    """
+    __slots__ = ('postings', 'words')
+
+    def __init__(self, version, applied, rows):
+        super().__init__(version, applied)
+        self.postings = {}
+        self.words = {}
+        for recipe_id, name, text in rows:
+            self.add(recipe_id, name, text)
+
+    @staticmethod
+    def get_rows(recipe_ids=None):
+        recipes = Recipe.objects.order_by()
+        if recipe_ids is not None:
+            recipes = recipes.filter(id__in=recipe_ids)
+        return recipes.values_list('id', 'name', 'text').iterator()
+
+    def add(self, recipe_id, name, text):
+        ranks = {}
+        for weight, value in ((SEARCH_NAME_WEIGHT, name),
+                              (SEARCH_TEXT_WEIGHT, text)):
+            for word in tokenize(value):
+                word = sys.intern(word)
+                ranks[word] = ranks.get(word, 0) + weight
+        for word, rank in ranks.items():
+            self.postings.setdefault(word, {})[recipe_id] = rank
+        self.words[recipe_id] = tuple(ranks)
+
+    def set_recipe(self, recipe_id, rows):
+        for word in self.words.pop(recipe_id, ()):
+            ranks = self.postings[word]
+            ranks.pop(recipe_id, None)
+            if not ranks:
+                del self.postings[word]
+        for name, text in rows:
+            self.add(recipe_id, name, text)
+
+    def search(self, query):
+        """
+        Method for getting dict of ranks by ids of recipes containing
+        all words of query.
+        """
+        found = None
+        for word in set(tokenize(query)):
+            ranks = self.postings.get(word, {})
+            if found is None:
+                found = dict(ranks)
+            else:
+                found = {recipe_id: rank + ranks.get(recipe_id, 0)
+                         for recipe_id, rank in found.items()
+                         if recipe_id in ranks}
+            if not found:
+                break
+        return found or {}
+
+
+class RecipeIngredientsIndex(RecipeChangesIndex):
+    """
+    Class for in-memory inverted index of recipes by ingredients.
+    Every ingredient has sorted array of ids of recipes containing it,
+    every recipe has sorted array of ids of its ingredients.
+    Arrays are replaced, not changed, so the index can be read while
+    it is updated.
+    """
+    __slots__ = ('recipes', 'ingredients')
+
+    def __init__(self, version, applied, rows):
+        super().__init__(version, applied)
+        recipes = {}
+        ingredients = {}
+        for recipe_id, ingredient_id in rows:
+            recipes.setdefault(ingredient_id, []).append(recipe_id)
+            ingredients.setdefault(recipe_id, []).append(ingredient_id)
+        self.recipes = {ingredient_id: array('q', sorted(ids))
+                        for ingredient_id, ids in recipes.items()}
+        self.ingredients = {recipe_id: array('q', sorted(ids))
+                            for recipe_id, ids in ingredients.items()}
+
+    @staticmethod
+    def get_rows(recipe_ids=None):
+        ingredients = IngredientInRecipe.objects.order_by()
+        if recipe_ids is not None:
+            ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        return ingredients.values_list(
+            'recipe_id', 'ingredient_id').iterator()
+
+    def set_recipe(self, recipe_id, rows):
+        current = set(self.ingredients.get(recipe_id, ()))
+        new = {ingredient_id for ingredient_id, in rows}
+        for ingredient_id in current - new:
+            self.recipes[ingredient_id] = array('q', (
+                other_id for other_id in self.recipes[ingredient_id]
+                if other_id != recipe_id))
+        for ingredient_id in new - current:
+            ids = self.recipes.get(ingredient_id, array('q'))
+            index = bisect_left(ids, recipe_id)
+            self.recipes[ingredient_id] = (
+                ids[:index] + array('q', (recipe_id,)) + ids[index:])
+        if new:
+            self.ingredients[recipe_id] = array('q', sorted(new))
+        else:
+            self.ingredients.pop(recipe_id, None)
+
+    def rank(self, ingredient_ids):
+        """
+        Method for getting list of (recipe id, number of available
+        ingredients, number of ingredients) for recipes containing any
+        of 'ingredient_ids', ordered by share of available ingredients
+        and then by number of missing ones.
+        """
+        matched = {}
+        for ingredient_id in set(ingredient_ids):
+            for recipe_id in self.recipes.get(ingredient_id, ()):
+                matched[recipe_id] = matched.get(recipe_id, 0) + 1
+        ranked = []
+        for recipe_id, count in matched.items():
+            ingredients = self.ingredients.get(recipe_id)
+            if ingredients:
+                ranked.append((recipe_id, count, len(ingredients)))
+        ranked.sort(key=lambda item: (-item[1] / item[2],
+                                      item[2] - item[1], item[0]))
+        return ranked
+
+
+_recipe_indexes = {}
+_recipe_indexes_locks = {RecipeSearchIndex: threading.Lock(),
+                         RecipeIngredientsIndex: threading.Lock()}
+
+
+def get_changes(after):
+    return list(RecipeChange.objects.filter(
+        id__gt=after - RECIPE_CHANGES_LOG_OVERLAP).order_by(
+            'id').values_list('id', 'recipe_id'))
+
+
+def build_recipe_index(index_class):
+    """
+    Function for building index from data of all recipes.
+    Log is read before the data, so changes made during the build
+    are applied again later.
+    """
+    last = RecipeChange.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0
+    applied = [change_id for change_id, _ in get_changes(last)
+               if change_id <= last]
+    return index_class(last, applied, index_class.get_rows())
+
+
+def get_recipe_index(index_class):
+    """
+    Function for getting process-local index of recipes.
+    New entries of change log are applied to the index, it is rebuilt
+    only if all recipes were changed or the process is far behind.
+    """
+    index = _recipe_indexes.get(index_class)
+    if index is not None:
+        changes = [change for change in get_changes(index.version)
+                   if change[0] not in index.applied]
+        if not changes:
+            return index
+    with _recipe_indexes_locks[index_class]:
+        index = _recipe_indexes.get(index_class)
+        if index is not None:
+            changes = [change for change in get_changes(index.version)
+                       if change[0] not in index.applied]
+            if not changes:
+                return index
+            if (len(changes) <= RECIPE_CHANGES_LOG_SIZE // 2
+                    and all(recipe_id is not None
+                            for _, recipe_id in changes)):
+                index.apply(changes)
+                return index
+        index = _recipe_indexes[index_class] = build_recipe_index(
+            index_class)
+        return index
+
+
+def get_recipes_search_index():
+    """
+    Function for getting process-local recipes search index.
+    """
+    return get_recipe_index(RecipeSearchIndex)
+
+
+def get_recipe_ingredients_index():
+    """
+    Function for getting process-local index of recipes by ingredients.
+    """
+    return get_recipe_index(RecipeIngredientsIndex)
+
+
+def reset_recipe_indexes():
+    """
+    Function for rebuilding indexes of all processes after bulk changes
+    made without signals.
+    """
+    RecipeChange.log(None)
@@ -0,0 +1,68 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from recipes.catalogue import get_request_versions, user_version
+
+
+class ConditionalGetMixin:
+    """
+    Mixin for answering list and retrieve requests with ETag and
+    Last-Modified headers and 304 responses without serializing data.
+    Views define get_version_stamp() which returns tuple
+    (parts of version, last modification datetime or None) or None
+    for responses without validators.
+    If 'user_dependent' the version of user's favorites, shopping cart
+    and subscriptions is added to ETag of authenticated users.
+    """
+    user_dependent = True
+
+    def get_version_stamp(self, request, *args, **kwargs):
+        return None
+
+    def get_validators(self, request, *args, **kwargs):
+        stamp = self.get_version_stamp(request, *args, **kwargs)
+        if stamp is None:
+            return None, None
+        parts, last_modified = stamp
+        parts = (*parts, request.get_full_path(),
+                 getattr(request.accepted_renderer, 'format', None))
+        if self.user_dependent and request.user.is_authenticated:
+            # Last-Modified does not change when user's flags change.
+            parts += tuple(get_request_versions(
+                request, user_version(request.user.pk)))
+            last_modified = None
+        etag = quote_etag(hashlib.sha1(
+            repr(parts).encode()).hexdigest())
+        if last_modified is not None:
+            last_modified = int(last_modified.timestamp())
+        return etag, last_modified
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return self.add_validators(response, etag, last_modified)
+
+    @staticmethod
+    def add_validators(response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
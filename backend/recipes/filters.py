@@ -1,32 +1,107 @@
-from django_filters.rest_framework import (FilterSet,
-                                           ModelMultipleChoiceFilter, filters)
-from rest_framework.filters import SearchFilter
+from django.db import connections
+from django.db.models import (Case, Exists, FloatField, IntegerField, OuterRef,
+                              Value, When)
+from django_filters.rest_framework import FilterSet, filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
 
-from recipes.models import Ingredient, Recipe, Tag
+from foodgram.constants import INGREDIENTS_SEARCH_LIMIT
+from recipes.catalogue import (get_ingredients_catalogue,
+                               get_recipes_search_index, get_tags_map)
+from recipes.models import Recipe
+from recipes.pagination import KeysetPagination
 
 
-class IngredientFilter(SearchFilter):
+class IngredientFilter(BaseFilterBackend):
+    """
+    Class for autocomplete search of ingredients by beginning of name.
+    With parameter 'mode=ranked' ingredients containing the name are
+    also found and ranked after the ones starting with it.
+    Postgres uses indexes from migration 0004, other databases are
+    searched in memory. Results are limited by INGREDIENTS_SEARCH_LIMIT.
+    """
     search_param = 'name'
+    mode_param = 'mode'
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def filter_queryset(self, request, queryset, view):
+        if view.action != 'list':
+            return queryset
+        name = request.query_params.get(self.search_param, '').strip()
+        ranked = request.query_params.get(self.mode_param) == 'ranked'
+        if not name:
+            return queryset[:INGREDIENTS_SEARCH_LIMIT]
+        if connections[queryset.db].vendor == 'postgresql':
+            return self.search_database(
+                queryset, name, ranked)[:INGREDIENTS_SEARCH_LIMIT]
+        return self.search_in_memory(queryset, name, ranked)
+
+    @staticmethod
+    def search_database(queryset, name, ranked):
+        if not ranked:
+            return queryset.filter(name__istartswith=name)
+        return queryset.filter(name__icontains=name).annotate(
+            rank=Case(When(name__istartswith=name, then=Value(0)),
+                      default=Value(1), output_field=IntegerField())
+        ).order_by('rank', 'name')
+
+    @staticmethod
+    def search_in_memory(queryset, name, ranked):
+        ids = [ingredient['id'] for ingredient
+               in get_ingredients_catalogue().search(
+                   name, ranked, INGREDIENTS_SEARCH_LIMIT)]
+        return queryset.filter(id__in=ids).order_by(Case(
+            *[When(id=ingredient_id, then=Value(position))
+              for position, ingredient_id in enumerate(ids)],
+            output_field=IntegerField()))
+
+
+def tag_choices():
+    return [(slug, slug) for slug in get_tags_map()]
 
 
 class RecipeFilters(FilterSet):
     """
     Class for filtering favorite recipes and recipes in shopping cart.
+    Tags are checked by slugs from cached tags map and filtered with
+    EXISTS subquery, so recipes with several tags are not duplicated.
+    Parameter 'search' orders found recipes by rank: Postgres uses
+    full-text search, other databases use in-memory search index.
+    Rank is not a key of keyset pagination, so 'search' can not be
+    combined with 'cursor'.
     """
-    tags = ModelMultipleChoiceFilter(queryset=Tag.objects.all(),
-                                     field_name='tags__slug',
-                                     to_field_name='slug')
+    tags = filters.MultipleChoiceFilter(choices=tag_choices,
+                                        method='filter_tags')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'tags', 'author')
+        fields = ('is_favorited', 'is_in_shopping_cart', 'tags', 'author',
+                  'search')
+
+    def filter_tags(self, queryset, name, value):
+        tags_map = get_tags_map()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[tags_map[slug] for slug in value
+                        if slug in tags_map])))
+
+    def filter_search(self, queryset, name, value):
+        if KeysetPagination.cursor_query_param in self.data:
+            raise ValidationError({KeysetPagination.cursor_query_param: (
+                'Курсор нельзя использовать вместе с поиском.')})
+        ordering = queryset.query.order_by or Recipe._meta.ordering
+        if connections[queryset.db].vendor == 'postgresql':
+            queryset = queryset.search(value)
+        else:
+            ranks = get_recipes_search_index().search(value)
+            queryset = queryset.filter(id__in=ranks).annotate(rank=Case(
+                *[When(id=recipe_id, then=Value(rank))
+                  for recipe_id, rank in ranks.items()],
+                default=Value(0), output_field=FloatField()))
+        return queryset.order_by('-rank', *ordering)
 
     def filter_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -0,0 +1,160 @@
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from foodgram.constants import (IMAGE_JPEG_QUALITY, IMAGE_MAX_BYTES,
+                                IMAGE_MAX_PIXELS, IMAGE_VARIANTS,
+                                IMAGE_VARIANTS_DIR, IMAGE_WEBP_QUALITY)
+from recipes.catalogue import RECIPES, bump_version
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+FORMATS = (
+    ('jpeg', 'jpg', {'quality': IMAGE_JPEG_QUALITY, 'optimize': True,
+                     'progressive': True}),
+    ('webp', 'webp', {'quality': IMAGE_WEBP_QUALITY, 'method': 4}),
+)
+
+
+class LimitedBase64ImageField(Base64ImageField):
+    """
+    Base64ImageField with limits of file size and number of pixels.
+    Size is checked before base64 is decoded, number of pixels is read
+    from image header before pixels are decoded.
+    """
+    def __init__(self, *args, max_bytes=IMAGE_MAX_BYTES,
+                 max_pixels=IMAGE_MAX_PIXELS, **kwargs):
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, base64_data):
+        if isinstance(base64_data, str):
+            data = base64_data.partition(';base64,')[2] or base64_data
+            if len(data) * 3 // 4 > self.max_bytes:
+                raise ValidationError(
+                    'Размер изображения не может быть больше '
+                    f'{self.max_bytes // (1024 * 1024)} МБ.')
+        return super().to_internal_value(base64_data)
+
+    def get_file_extension(self, filename, decoded_file):
+        try:
+            with Image.open(io.BytesIO(decoded_file)) as image:
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        if width * height > self.max_pixels:
+            raise ValidationError(
+                'Изображение не может содержать больше '
+                f'{self.max_pixels} пикселей.')
+        return super().get_file_extension(filename, decoded_file)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Field for urls of resized variants of recipe image by names
+    of variants and formats.
+    """
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'image_variants'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        urls = {}
+        for variant, formats in variants.items():
+            urls[variant] = {}
+            for image_format, name in formats.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[variant][image_format] = url
+        return urls
+
+
+def resize(image, width):
+    if image.width <= width:
+        return image
+    return image.resize(
+        (width, round(image.height * width / image.width)),
+        Image.LANCZOS)
+
+
+def generate_variants(recipe_id, name):
+    """
+    Function for saving resized JPEG and WebP variants of recipe image.
+    Variants are not saved to recipe if its image was changed meanwhile.
+    """
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    variants = {}
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for variant, width in IMAGE_VARIANTS:
+            resized = resize(image, width)
+            variants[variant] = {}
+            for image_format, extension, options in FORMATS:
+                buffer = io.BytesIO()
+                resized.save(buffer, image_format, **options)
+                variants[variant][image_format] = default_storage.save(
+                    posixpath.join(IMAGE_VARIANTS_DIR,
+                                   f'{stem}_{variant}.{extension}'),
+                    ContentFile(buffer.getvalue()))
+    if Recipe.objects.filter(pk=recipe_id, image=name).update(
+            image_variants=variants, updated_at=timezone.now()):
+        bump_version(RECIPES)
+
+
+def run_generate_variants(recipe_id, name, in_thread=False):
+    try:
+        generate_variants(recipe_id, name)
+    except Exception:
+        logger.exception('Не удалось создать варианты изображения %s', name)
+    finally:
+        if in_thread:
+            connections.close_all()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix='image-variants')
+        return _executor
+
+
+def schedule_variants(recipe):
+    """
+    Function for generating variants of recipe image after current
+    transaction is committed. Variants are generated in thread pool
+    unless IMAGE_PROCESSING_WORKERS is 0.
+    """
+    recipe_id, name = recipe.id, recipe.image.name
+
+    def schedule():
+        if settings.IMAGE_PROCESSING_WORKERS:
+            get_executor().submit(
+                run_generate_variants, recipe_id, name, True)
+        else:
+            run_generate_variants(recipe_id, name)
+
+    transaction.on_commit(schedule)
@@ -0,0 +1,222 @@
+from array import array
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from scipy import sparse
+
+from foodgram.constants import (RECOMMENDATION_FAVORITE_WEIGHT,
+                                RECOMMENDATION_MAX_USER_RECIPES,
+                                RECOMMENDATION_SHOPPING_CART_WEIGHT,
+                                RECOMMENDATION_SUBSCRIPTION_BOOST,
+                                RECOMMENDED_RECIPES_LIMIT,
+                                SIMILAR_RECIPES_LIMIT)
+from recipes.models import (FavoriteRecipe, Recipe, RecommendedRecipe,
+                            ShoppingCart, SimilarRecipe)
+from users.models import Subscription
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_BLOCK_SIZE = 2000
+READ_CHUNK_SIZE = 10000
+# Scores are rounded, so equal scores are ordered by id, not by error
+# of floating point sums.
+SCORE_DECIMALS = 12
+
+
+def read_pairs(queryset):
+    """
+    Function for reading pairs of ids from queryset into two int64 arrays
+    without keeping rows as tuples.
+    """
+    first, second = array('q'), array('q')
+    for first_id, second_id in queryset.order_by().iterator(
+            chunk_size=READ_CHUNK_SIZE):
+        first.append(first_id)
+        second.append(second_id)
+    return (np.array(first, dtype=np.int64),
+            np.array(second, dtype=np.int64))
+
+
+def top_per_row(matrix, limit):
+    """
+    Function for getting arrays (rows, columns, values) of top 'limit'
+    values of every row of sparse matrix, ties are broken by column.
+    Long rows are cut by partition first, so only candidates are sorted.
+    """
+    matrix = matrix.tocsr()
+    values = np.round(matrix.data, SCORE_DECIMALS)
+    lengths = np.diff(matrix.indptr)
+    keep = np.ones(len(values), dtype=bool)
+    for row in np.flatnonzero(lengths > limit):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        cut = end - start - limit
+        threshold = np.partition(values[start:end], cut)[cut]
+        keep[start:end] = values[start:end] >= threshold
+    rows = np.repeat(np.arange(matrix.shape[0]), lengths)[keep]
+    columns = matrix.indices[keep]
+    values = values[keep]
+    order = np.lexsort((columns, -values, rows))
+    rank = np.arange(len(order)) - np.searchsorted(rows[order], rows[order])
+    order = order[rank < limit]
+    return rows[order], columns[order], values[order]
+
+
+class Command(BaseCommand):
+    """
+    Class for building recipe recommendations.
+    Recipes saved by the same users are similar (cosine similarity of
+    weighted favorites and shopping carts). Recommendations of user are
+    neighbours of recipes saved by the user, recipes of followed authors
+    are boosted.
+    Interactions are kept in sparse matrix of users by recipes,
+    co-occurrences are computed as its Gram matrix by blocks of recipes
+    and only top neighbours of every block are kept.
+    """
+    help = 'Build similar and recommended recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--neighbours', type=int, default=SIMILAR_RECIPES_LIMIT,
+            help='Number of similar recipes kept for every recipe.')
+        parser.add_argument(
+            '--recommendations', type=int,
+            default=RECOMMENDED_RECIPES_LIMIT,
+            help='Number of recommended recipes kept for every user.')
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows inserted with one query.')
+        parser.add_argument(
+            '--block-size', type=int, default=DEFAULT_BLOCK_SIZE,
+            help='Number of recipes or users multiplied at once.')
+
+    @staticmethod
+    def get_interactions():
+        """
+        Method for getting sparse matrix of weights of recipes by users
+        and arrays of ids of its users and recipes.
+        """
+        users, recipes, weights = [], [], []
+        for model, weight in (
+                (FavoriteRecipe, RECOMMENDATION_FAVORITE_WEIGHT),
+                (ShoppingCart, RECOMMENDATION_SHOPPING_CART_WEIGHT)):
+            user_ids, recipe_ids = read_pairs(
+                model.objects.values_list('user_id', 'recipe_id'))
+            users.append(user_ids)
+            recipes.append(recipe_ids)
+            weights.append(np.full(len(user_ids), weight, dtype=np.float64))
+        user_ids, rows = np.unique(np.concatenate(users),
+                                   return_inverse=True)
+        recipe_ids, columns = np.unique(np.concatenate(recipes),
+                                        return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (np.concatenate(weights), (rows, columns)),
+            shape=(len(user_ids), len(recipe_ids)))
+        matrix.sum_duplicates()
+        return matrix, user_ids, recipe_ids
+
+    @staticmethod
+    def get_similar(matrix, limit, block_size):
+        """
+        Method for getting sparse matrix of top 'limit' similar recipes
+        for every recipe. Rows of users longer than
+        RECOMMENDATION_MAX_USER_RECIPES are cut to the heaviest ones.
+        """
+        rows, columns, values = top_per_row(
+            matrix, RECOMMENDATION_MAX_USER_RECIPES)
+        matrix = sparse.csr_matrix((values, (rows, columns)),
+                                   shape=matrix.shape)
+        transposed = matrix.T.tocsr()
+        norms = np.sqrt(np.asarray(
+            matrix.multiply(matrix).sum(axis=0)).ravel())
+        count = matrix.shape[1]
+        rows, columns, values = [], [], []
+        for start in range(0, count, block_size):
+            block = (transposed[start:start + block_size] @ matrix).tocoo()
+            other = block.row + start != block.col
+            block_rows = block.row[other]
+            block_columns = block.col[other]
+            scores = block.data[other] / (
+                norms[block_rows + start] * norms[block_columns])
+            block_rows, block_columns, scores = top_per_row(
+                sparse.coo_matrix((scores, (block_rows, block_columns)),
+                                  shape=block.shape), limit)
+            rows.append(block_rows + start)
+            columns.append(block_columns)
+            values.append(scores)
+        if not rows:
+            return sparse.csr_matrix((count, count))
+        return sparse.csr_matrix(
+            (np.concatenate(values),
+             (np.concatenate(rows), np.concatenate(columns))),
+            shape=(count, count))
+
+    @staticmethod
+    def get_recommended(matrix, user_ids, recipe_ids, similar, limit,
+                        block_size):
+        """
+        Method for getting arrays (users, recipes, scores) of top 'limit'
+        recommended recipes for every user.
+        Recipes saved by user and recipes of user are not recommended.
+        """
+        ids, authors = read_pairs(Recipe.objects.values_list(
+            'id', 'author_id'))
+        order = np.argsort(ids)
+        authors = authors[order][np.searchsorted(ids[order], recipe_ids)]
+        followers, followed = read_pairs(Subscription.objects.values_list(
+            'user_id', 'author_id'))
+        base = int(max(followed.max(initial=0), authors.max(initial=0))) + 1
+        subscriptions = np.unique(followers * base + followed)
+        users, recipes, values = [], [], []
+        for start in range(0, matrix.shape[0], block_size):
+            saved = matrix[start:start + block_size]
+            scores = (saved @ similar).tocoo()
+            if not scores.nnz:
+                continue
+            user = user_ids[scores.row + start]
+            author = authors[scores.col]
+            keep = ((author != user) & ~np.asarray(
+                saved[scores.row, scores.col]).ravel().astype(bool))
+            boost = np.where(
+                np.isin(user * base + author, subscriptions),
+                1 + RECOMMENDATION_SUBSCRIPTION_BOOST, 1)
+            rows, columns, block_values = top_per_row(sparse.coo_matrix(
+                ((scores.data * boost)[keep],
+                 (scores.row[keep], scores.col[keep])),
+                shape=scores.shape), limit)
+            users.append(user_ids[rows + start])
+            recipes.append(recipe_ids[columns])
+            values.append(block_values)
+        if not users:
+            return (np.array([], dtype=np.int64),) * 2 + (np.array([]),)
+        return (np.concatenate(users), np.concatenate(recipes),
+                np.concatenate(values))
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        block_size = options['block_size']
+        matrix, user_ids, recipe_ids = self.get_interactions()
+        similar = self.get_similar(matrix, options['neighbours'], block_size)
+        users, recipes, scores = self.get_recommended(
+            matrix, user_ids, recipe_ids, similar,
+            options['recommendations'], block_size)
+        similar = similar.tocoo()
+        with transaction.atomic():
+            SimilarRecipe.objects.all().delete()
+            SimilarRecipe.objects.bulk_create(
+                (SimilarRecipe(recipe_id=int(recipe_ids[row]),
+                               similar_id=int(recipe_ids[column]),
+                               score=float(score))
+                 for row, column, score in zip(
+                     similar.row, similar.col, similar.data)),
+                batch_size=batch_size)
+            RecommendedRecipe.objects.all().delete()
+            RecommendedRecipe.objects.bulk_create(
+                (RecommendedRecipe(user_id=int(user_id),
+                                   recipe_id=int(recipe_id),
+                                   score=float(score))
+                 for user_id, recipe_id, score in zip(
+                     users, recipes, scores)),
+                batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов с похожими рецептами: {len(np.unique(similar.row))}, '
+            f'пользователей с рекомендациями: {len(np.unique(users))}'))
@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from foodgram.constants import MEDIA_GC_BATCH_SIZE, MEDIA_GC_MIN_AGE_HOURS
+from recipes.models import Recipe
+
+# Names are ordered by code points like Python compares strings.
+REFERENCED_SQL = {
+    'postgresql': """
+        SELECT name FROM (
+            SELECT image AS name FROM {table} WHERE image <> ''
+            UNION
+            SELECT formats.value FROM {table},
+                jsonb_each(image_variants) AS variants,
+                jsonb_each_text(variants.value) AS formats
+        ) AS names ORDER BY name COLLATE "C"
+    """,
+    'sqlite': """
+        SELECT name FROM (
+            SELECT image AS name FROM {table} WHERE image <> ''
+            UNION
+            SELECT formats.value FROM {table},
+                json_each(image_variants) AS variants,
+                json_each(variants.value) AS formats
+        ) AS names ORDER BY name
+    """,
+}
+
+
+def walk(storage, path=''):
+    """
+    Function for iterating over names of all files in storage
+    in sorted order.
+    """
+    directories, files = storage.listdir(path)
+    # Directory 'a' is listed after file 'a.png' like 'a/...' is.
+    entries = sorted([(name, False) for name in files]
+                     + [(name + '/', True) for name in directories])
+    for name, is_directory in entries:
+        if is_directory:
+            yield from walk(storage, path + name)
+        else:
+            yield path + name
+
+
+def get_referenced(batch_size):
+    """
+    Function for iterating over sorted names of images and image
+    variants of recipes. Names are read by server-side cursor
+    in batches, so the table is scanned once.
+    """
+    sql = REFERENCED_SQL[connection.vendor].format(
+        table=connection.ops.quote_name(Recipe._meta.db_table))
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for name, in rows:
+                yield name
+
+
+def ascending(names, source):
+    previous = None
+    for name in names:
+        if previous is not None and name <= previous:
+            raise CommandError(
+                f'{source}: имена не упорядочены ({previous}, {name}).')
+        previous = name
+        yield name
+
+
+class Command(BaseCommand):
+    """
+    Class for deleting media files which are not used by any recipe.
+    Sorted names of files in storage are merged with sorted names used
+    by recipes, so neither storage nor table is loaded into memory and
+    the table is read once. Recently modified files are skipped because
+    recipe using them may be not committed yet. Storage refreshes
+    modification time of a file when it is saved again, and the time
+    is read right before deleting, so a file reused after the names
+    were read is kept.
+    """
+    help = 'Delete media files not referenced by recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=MEDIA_GC_BATCH_SIZE,
+            help='Number of names read from the database at once.')
+        parser.add_argument(
+            '--min-age', type=int, default=MEDIA_GC_MIN_AGE_HOURS,
+            help='Files modified less than this number of hours ago '
+                 'are kept.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Show unreferenced files without deleting them.')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        modified_before = timezone.now() - timedelta(hours=options['min_age'])
+        files = ascending(walk(storage), 'Хранилище')
+        referenced = ascending(
+            get_referenced(options['batch_size']), 'База данных')
+        current = next(referenced, None)
+        checked = deleted = freed = 0
+        for name in files:
+            checked += 1
+            while current is not None and current < name:
+                current = next(referenced, None)
+            if (name == current
+                    or storage.get_modified_time(name) > modified_before):
+                continue
+            size = storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+            deleted += 1
+            freed += size
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {checked}. {action} неиспользуемых: '
+            f'{deleted} ({freed} байт).'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Class for generating resized variants of images of existing recipes.
+    """
+    help = 'Generate resized variants of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate variants of all recipes.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by('pk')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        generated = failed = 0
+        for recipe_id, name in recipes.values_list('id', 'image').iterator():
+            try:
+                generate_variants(recipe_id, name)
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            else:
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {generated}, с ошибками: {failed}'))
@@ -1,20 +1,162 @@
 import csv
+import json
+import sys
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
+from recipes.catalogue import INGREDIENTS, bump_version
 from recipes.models import Ingredient
 
+DEFAULT_PATH = Path(settings.BASE_DIR) / 'recipes' / 'data' / 'ingredients.csv'
+DEFAULT_BATCH_SIZE = 5000
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    """
+    Function for reading rows (name, measurement_unit) from csv file.
+    Blank rows are skipped.
+    """
+    reader = csv.reader(file)
+    for row in reader:
+        if not any(value.strip() for value in row):
+            continue
+        if len(row) < 2:
+            raise CommandError(
+                f'Строка {reader.line_num}: ожидается название и единица '
+                'измерения.')
+        yield row[0], row[1]
+
+
+def get_row(obj, position):
+    """
+    Function for getting row (name, measurement_unit) from json object,
+    'position' names the object in error message.
+    """
+    if (not isinstance(obj, dict)
+            or not isinstance(obj.get('name'), str)
+            or not isinstance(obj.get('measurement_unit'), str)):
+        raise CommandError(
+            f'{position}: ожидается объект с полями name и '
+            'measurement_unit.')
+    return obj['name'], obj['measurement_unit']
+
+
+def read_json(file):
+    """
+    Function for lazily reading rows (name, measurement_unit) from json
+    array of objects without loading the whole file into memory.
+    """
+    decoder = json.JSONDecoder()
+    index = 0
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON файл должен содержать список.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON файл.')
+            buffer += chunk
+            continue
+        yield get_row(obj, f'Элемент {index}')
+        index += 1
+        buffer = buffer[end:]
+
+
+def read_ndjson(file):
+    """
+    Function for reading rows (name, measurement_unit) from file with
+    one json object per line. Blank lines are skipped.
+    """
+    for line_num, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            raise CommandError(f'Строка {line_num}: некорректный JSON.')
+        yield get_row(obj, f'Строка {line_num}')
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'ndjson': read_ndjson}
+
 
 class Command(BaseCommand):
     """
-    Class for loading ingredients.csv to the database.
+    Class for loading ingredients from csv, json or ndjson file
+    to the database.
     """
-    help = 'Load ingredients.csv to the database'
+    help = 'Load ingredients from csv, json or ndjson file to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=str(DEFAULT_PATH),
+            help='Path to file with ingredients, "-" for stdin.')
+        parser.add_argument(
+            '--format', choices=READERS.keys(),
+            help='Format of file, detected by extension by default.')
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows inserted with one query.')
 
     def handle(self, *args, **options):
-        with open('recipes/data/ingredients.csv', encoding='utf-8') as file:
-            file_reader = csv.reader(file)
-            for row in file_reader:
-                name, measurement_unit = row
-                Ingredient.objects.get_or_create(
-                    name=name, measurement_unit=measurement_unit)
+        path = options['path']
+        file_format = options['format'] or Path(path).suffix.lstrip('.')
+        if file_format not in READERS:
+            raise CommandError(
+                'Не удалось определить формат файла, укажите --format.')
+
+        if path == '-':
+            total, created, duration = self.load(
+                READERS[file_format](sys.stdin), options)
+        else:
+            try:
+                with open(path, encoding='utf-8') as file:
+                    total, created, duration = self.load(
+                        READERS[file_format](file), options)
+            except FileNotFoundError:
+                raise CommandError(f'Файл {path} не найден.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {total}, добавлено ингредиентов: {created}, '
+            f'{total / max(duration, 1e-9):.0f} строк/сек.'))
+
+    def load(self, rows, options):
+        """
+        Method for inserting rows into the database by batches.
+        Existing ingredients are skipped by the constraint
+        'unique_name_measurement_unit'.
+        """
+        batch_size = options['batch_size']
+        verbosity = options['verbosity']
+        count_before = Ingredient.objects.count()
+        start = time.monotonic()
+        total = 0
+        while True:
+            batch = [
+                Ingredient(name=name.strip(),
+                           measurement_unit=measurement_unit.strip())
+                for name, measurement_unit in islice(rows, batch_size)]
+            if not batch:
+                break
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+            if verbosity > 1:
+                duration = time.monotonic() - start
+                self.stdout.write(
+                    f'{total} строк, {total / max(duration, 1e-9):.0f} '
+                    'строк/сек.')
+        duration = time.monotonic() - start
+        bump_version(INGREDIENTS)
+        return total, Ingredient.objects.count() - count_before, duration
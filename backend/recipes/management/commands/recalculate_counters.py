@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+DEFAULT_BATCH_SIZE = 10000
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+
+
+def count_subquery(related_model, related_field):
+    """
+    Function for getting subquery which counts related objects.
+    """
+    return Coalesce(Subquery(
+        related_model.objects.filter(**{related_field: OuterRef('pk')})
+        .order_by().values(related_field)
+        .annotate(count=Count('pk')).values('count')), 0)
+
+
+class Command(BaseCommand):
+    """
+    Class for recalculating denormalized counters.
+    """
+    help = ('Recalculate favorites, shopping cart, recipes and followers '
+            'counters')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows checked with one query.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report counters which differ from actual values.')
+
+    def handle(self, *args, **options):
+        for model, field, related_model, related_field in COUNTERS:
+            fixed = self.recalculate(
+                model, field, count_subquery(related_model, related_field),
+                options['batch_size'], options['dry_run'])
+            self.stdout.write(
+                f'{model.__name__}.{field}: '
+                f'{"найдено" if options["dry_run"] else "исправлено"} '
+                f'расхождений: {fixed}')
+
+    @staticmethod
+    def recalculate(model, field, actual, batch_size, dry_run):
+        """
+        Method for fixing counter by batches of primary keys.
+        """
+        fixed = 0
+        last_pk = model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        for start in range(0, last_pk + 1, batch_size):
+            with transaction.atomic():
+                drifted = list(model.objects.filter(
+                    pk__gte=start, pk__lt=start + batch_size,
+                ).annotate(actual=actual).exclude(
+                    **{field: F('actual')}).values_list('pk', flat=True))
+                if drifted and not dry_run:
+                    model.objects.filter(pk__in=drifted).update(
+                        **{field: actual})
+            fixed += len(drifted)
+        return fixed
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from foodgram.constants import (POPULAR_FAVORITE_WEIGHT,
+                                POPULAR_SHOPPING_CART_WEIGHT)
+from recipes.models import PopularRecipe, Recipe
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    """
+    Class for refreshing ranking of popular recipes.
+    Only recipes whose counters changed since previous refresh are updated.
+    """
+    help = 'Refresh ranking of popular recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows updated with one query.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        is_new = Q(popularity__isnull=True) & (
+            Q(favorites_count__gt=0) | Q(shopping_cart_count__gt=0))
+        is_changed = Q(popularity__isnull=False) & (
+            ~Q(popularity__favorites_count=F('favorites_count'))
+            | ~Q(popularity__shopping_cart_count=F('shopping_cart_count')))
+        changed = Recipe.objects.filter(
+            is_new | is_changed,
+        ).order_by('pk').values_list(
+            'pk', 'favorites_count', 'shopping_cart_count')
+
+        refreshed = 0
+        last_pk = 0
+        while True:
+            batch = list(changed.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                PopularRecipe.objects.bulk_create(
+                    [PopularRecipe(
+                        recipe_id=pk,
+                        score=(favorites_count * POPULAR_FAVORITE_WEIGHT
+                               + shopping_cart_count
+                               * POPULAR_SHOPPING_CART_WEIGHT),
+                        favorites_count=favorites_count,
+                        shopping_cart_count=shopping_cart_count)
+                     for pk, favorites_count, shopping_cart_count in batch],
+                    update_conflicts=True,
+                    unique_fields=('recipe',),
+                    update_fields=('score', 'favorites_count',
+                                   'shopping_cart_count', 'refreshed_at'))
+            refreshed += len(batch)
+            last_pk = batch[-1][0]
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов в рейтинге: {refreshed}'))
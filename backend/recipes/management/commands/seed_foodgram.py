@@ -0,0 +1,435 @@
+import io
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from foodgram.constants import FEED_BACKFILL_SIZE, FEED_FANOUT_LIMIT
+from recipes.catalogue import (INGREDIENTS, RECIPES, TAGS, bump_version,
+                               reset_recipe_indexes)
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Tag, TimelineEntry)
+from users.models import Subscription, User
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_EXPONENT = 1.1
+
+TAG_NAMES = (
+    ('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'),
+    ('Десерт', 'dessert'), ('Выпечка', 'bakery'), ('Салат', 'salad'),
+    ('Суп', 'soup'), ('Закуска', 'snack'), ('Напиток', 'drink'),
+    ('Вегетарианское', 'vegetarian'))
+DISHES = ('Суп', 'Салат', 'Пирог', 'Омлет', 'Каша', 'Рагу', 'Паста',
+          'Запеканка', 'Блины', 'Котлеты', 'Соус', 'Смузи')
+
+
+class Zipf:
+    """
+    Class for sampling items with probability inversely proportional
+    to power of their rank. Items are ranked in the given order.
+    """
+    def __init__(self, items, exponent, rnd):
+        self.items = items
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(items) + 1)))
+        self.rnd = rnd
+
+    def sample(self, k):
+        return self.rnd.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+    def sample_distinct(self, k, exclude=None):
+        """
+        Method for sampling up to 'k' different items except 'exclude'.
+        """
+        k = min(k, len(self.items) - (exclude is not None))
+        if k * 2 > len(self.items):
+            population = [item for item in self.items if item != exclude]
+            return sorted(self.rnd.sample(population, k))
+        chosen = set()
+        while len(chosen) < k:
+            chosen.update(self.sample(k - len(chosen)))
+            chosen.discard(exclude)
+        return sorted(chosen)
+
+
+def allocate(total, size, exponent, cap):
+    """
+    Function for splitting 'total' between 'size' ranks proportionally
+    to Zipf weights, no rank gets more than 'cap'.
+    """
+    weights = [1 / rank ** exponent for rank in range(1, size + 1)]
+    remaining_weight = sum(weights)
+    counts = []
+    for weight in weights:
+        count = min(cap, round(total * weight / remaining_weight))
+        counts.append(count)
+        total -= count
+        remaining_weight -= weight
+    return counts
+
+
+def batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert(model, fields, rows, batch_size):
+    """
+    Function for inserting tuples of values of 'fields' into model table
+    with COPY on Postgres and by batches of INSERT elsewhere.
+    Model methods and signals are not called.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(
+        connection.ops.quote_name(model._meta.get_field(field).column)
+        for field in fields)
+    total = 0
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql' and is_psycopg3:
+            with cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    total += 1
+            return total
+        sql = (f'INSERT INTO {table} ({columns}) '
+               f'VALUES ({", ".join(["%s"] * len(fields))})')
+        for batch in batches(rows, batch_size):
+            cursor.executemany(sql, batch)
+            total += len(batch)
+    return total
+
+
+def next_id(model):
+    return (model.objects.aggregate(Max('pk'))['pk__max'] or 0) + 1
+
+
+class Command(BaseCommand):
+    """
+    Class for filling the database with synthetic data for load testing.
+    Authors, followed authors, favorite recipes and ingredients are
+    chosen by Zipf distribution, so few users and recipes get most
+    of activity like in production. The same options and seed always
+    produce the same data. With --with-rankings popular and recommended
+    recipes are refreshed at the end, so ranked endpoints are not empty.
+    """
+    help = 'Fill the database with synthetic users, recipes and activity'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Number of users.')
+        parser.add_argument(
+            '--recipes', type=int, default=10000,
+            help='Number of recipes.')
+        parser.add_argument(
+            '--tags', type=int, default=len(TAG_NAMES),
+            help='Number of tags.')
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=8,
+            help='Average number of ingredients in recipe.')
+        parser.add_argument(
+            '--favorites', type=int, default=100000,
+            help='Number of recipes added to favorites.')
+        parser.add_argument(
+            '--carts', type=int, default=20000,
+            help='Number of recipes added to shopping carts.')
+        parser.add_argument(
+            '--subscriptions', type=int, default=10000,
+            help='Number of subscriptions.')
+        parser.add_argument(
+            '--timelines', action='store_true',
+            help='Fill timelines of followers like subscribing does.')
+        parser.add_argument(
+            '--with-rankings', action='store_true',
+            help='Refresh popular and recommended recipes at the end.')
+        parser.add_argument(
+            '--exponent', type=float, default=DEFAULT_EXPONENT,
+            help='Exponent of Zipf distributions, 0 for uniform.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Recipes are published during this number of days.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed of random generators.')
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Prefix of usernames and emails of created users.')
+        parser.add_argument(
+            '--password', default='foodgram',
+            help='Password of created users.')
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows inserted with one query without COPY.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError(
+                'Нужно не меньше 2 пользователей и 1 рецепта.')
+        if User.objects.filter(
+                username__startswith=options['prefix']).exists():
+            raise CommandError(
+                f'Пользователи с префиксом "{options["prefix"]}" уже '
+                'существуют, укажите другой --prefix.')
+        self.ingredients = list(
+            Ingredient.objects.order_by('pk').values_list('pk', 'name'))
+        if not self.ingredients:
+            raise CommandError(
+                'Нет ингредиентов, сначала выполните import_ingredients.')
+        self.options = options
+        self.now = timezone.now()
+        start = time.monotonic()
+        with transaction.atomic():
+            self.create_tags()
+            self.create_users()
+            self.create_recipes()
+            self.create_recipe_relations()
+            self.create_activity()
+            if options['timelines']:
+                self.create_timelines()
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                        no_style(), [User, Recipe]):
+                    cursor.execute(sql)
+            self.report('Счётчики', self.update_counters)
+            self.report('Авторы без рассылки', self.mark_pulled_authors)
+            Recipe.objects.filter(
+                pk__gte=self.first_recipe_id).update_search_vector()
+        for name in (INGREDIENTS, TAGS, RECIPES):
+            bump_version(name)
+        reset_recipe_indexes()
+        if options['with_rankings']:
+            self.report('Популярные рецепты', self.refresh_rankings(
+                'refresh_popular_recipes'))
+            self.report('Рекомендации', self.refresh_rankings(
+                'build_recommendations'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {time.monotonic() - start:.1f} сек.'))
+
+    def random(self, name):
+        return random.Random(f'{self.options["seed"]}:{name}')
+
+    def report(self, title, create):
+        start = time.monotonic()
+        total = create()
+        duration = time.monotonic() - start
+        if total is None:
+            self.stdout.write(f'{title}: {duration:.1f} сек.')
+            return
+        self.stdout.write(
+            f'{title}: {total} строк за {duration:.1f} сек., '
+            f'{total / max(duration, 1e-9):.0f} строк/сек.')
+
+    def create_tags(self):
+        rnd = self.random('tags')
+        tags = [
+            TAG_NAMES[number] if number < len(TAG_NAMES)
+            else (f'Тег {number}', f'tag-{number}')
+            for number in range(self.options['tags'])]
+        Tag.objects.bulk_create(
+            [Tag(name=name, slug=slug, color=f'#{rnd.randrange(16**6):06X}')
+             for name, slug in tags],
+            ignore_conflicts=True)
+        self.tags = list(Tag.objects.filter(
+            slug__in=[slug for _, slug in tags]).values_list('pk', flat=True))
+        if not self.tags:
+            raise CommandError('Не удалось создать теги.')
+
+    def create_users(self):
+        """
+        Method for creating users. Users are ranked by activity: order
+        of ids is shuffled, so the most active users are spread over ids.
+        """
+        options = self.options
+        first_id = next_id(User)
+        self.user_ids = list(range(first_id, first_id + options['users']))
+        self.user_ranks = self.user_ids[:]
+        self.random('user_ranks').shuffle(self.user_ranks)
+        password = make_password(options['password'])
+        date_joined = connection.ops.adapt_datetimefield_value(
+            self.now - timedelta(days=options['days']))
+        prefix = options['prefix']
+        rows = (
+            (user_id, password, False, f'{prefix}{number}',
+             'Имя', 'Фамилия', f'{prefix}{number}@example.com', False,
+             True, date_joined, 0, 0, False)
+            for number, user_id in enumerate(self.user_ids))
+        self.report('Пользователи', lambda: insert(
+            User, ('id', 'password', 'is_superuser', 'username',
+                   'first_name', 'last_name', 'email', 'is_staff',
+                   'is_active', 'date_joined', 'recipes_count',
+                   'followers_count', 'feed_pulled'),
+            rows, options['batch_size']))
+
+    def create_recipes(self):
+        """
+        Method for creating recipes published evenly during 'days'.
+        Authors are chosen by Zipf distribution over ranks of users.
+        """
+        options = self.options
+        rnd = self.random('recipes')
+        self.first_recipe_id = next_id(Recipe)
+        count = options['recipes']
+        self.recipe_ids = list(range(
+            self.first_recipe_id, self.first_recipe_id + count))
+        self.authors = Zipf(self.user_ranks, options['exponent'],
+                            rnd).sample(count)
+        image = self.create_image()
+        start = self.now - timedelta(days=options['days'])
+        step = timedelta(days=options['days']) / count
+        self.pub_dates = [
+            start + step * (number + rnd.random())
+            for number in range(count)]
+        adapt = connection.ops.adapt_datetimefield_value
+        rows = (
+            (recipe_id, author_id,
+             f'{rnd.choice(DISHES)} №{recipe_id}', image, '{}',
+             'Смешать ингредиенты и готовить до готовности.',
+             max(1, round(rnd.lognormvariate(3.3, 0.6))),
+             adapt(pub_date), adapt(pub_date), 0, 0, True)
+            for recipe_id, author_id, pub_date in zip(
+                self.recipe_ids, self.authors, self.pub_dates))
+        self.report('Рецепты', lambda: insert(
+            Recipe, ('id', 'author', 'name', 'image', 'image_variants',
+                     'text', 'cooking_time', 'pub_date', 'updated_at',
+                     'favorites_count', 'shopping_cart_count',
+                     'fanned_out'),
+            rows, options['batch_size']))
+
+    def create_image(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (480, 320), (230, 200, 160)).save(buffer, 'JPEG')
+        return default_storage.save(
+            'recipes/seed.jpg', ContentFile(buffer.getvalue()))
+
+    def create_recipe_relations(self):
+        """
+        Method for adding tags and ingredients to recipes. Popular
+        ingredients (the first ones in catalogue are shuffled) are used
+        in most recipes.
+        """
+        options = self.options
+        rnd = self.random('ingredients')
+        ranks = [ingredient_id for ingredient_id, _ in self.ingredients]
+        rnd.shuffle(ranks)
+        ingredients = Zipf(ranks, options['exponent'], rnd)
+        average = max(1, options['ingredients_per_recipe'])
+        low, high = max(1, average // 2), average * 3 // 2 + 1
+
+        def ingredient_rows():
+            for recipe_id in self.recipe_ids:
+                for ingredient_id in ingredients.sample_distinct(
+                        rnd.randint(low, high)):
+                    yield recipe_id, ingredient_id, rnd.randint(1, 500)
+
+        self.report('Ингредиенты в рецептах', lambda: insert(
+            IngredientInRecipe, ('recipe', 'ingredient', 'amount'),
+            ingredient_rows(), options['batch_size']))
+
+        tag_rnd = self.random('recipe_tags')
+        tags = Zipf(self.tags, options['exponent'], tag_rnd)
+        rows = (
+            (recipe_id, tag_id)
+            for recipe_id in self.recipe_ids
+            for tag_id in tags.sample_distinct(tag_rnd.randint(1, 3)))
+        self.report('Теги рецептов', lambda: insert(
+            Recipe.tags.through, ('recipe', 'tag'),
+            rows, options['batch_size']))
+
+    def pairs(self, name, total, items, cap, exclude_self=False):
+        """
+        Method for generating 'total' unique pairs (user, item).
+        Number of pairs of user is given by Zipf distribution over
+        ranks of users, items are chosen by Zipf distribution too.
+        """
+        rnd = self.random(name)
+        sampler = Zipf(items, self.options['exponent'], rnd)
+        counts = allocate(total, len(self.user_ranks),
+                          self.options['exponent'], cap)
+        for user_id, count in zip(self.user_ranks, counts):
+            if not count:
+                continue
+            for item in sampler.sample_distinct(
+                    count, exclude=user_id if exclude_self else None):
+                yield user_id, item
+
+    def create_activity(self):
+        options = self.options
+        recipe_ranks = self.recipe_ids[:]
+        self.random('recipe_ranks').shuffle(recipe_ranks)
+        cap = max(1, len(recipe_ranks) // 10)
+        for model, name, title in (
+                (FavoriteRecipe, 'favorites', 'Избранное'),
+                (ShoppingCart, 'carts', 'Списки покупок')):
+            rows = self.pairs(name, options[name], recipe_ranks, cap)
+            self.report(title, lambda: insert(
+                model, ('user', 'recipe'), rows, options['batch_size']))
+        # Authors with more recipes have more followers.
+        self.subscriptions = list(self.pairs(
+            'subscriptions', options['subscriptions'], self.user_ranks,
+            max(1, len(self.user_ranks) // 10), exclude_self=True))
+        self.report('Подписки', lambda: insert(
+            Subscription, ('user', 'author'), self.subscriptions,
+            options['batch_size']))
+
+    def create_timelines(self):
+        """
+        Method for writing latest recipes of followed authors to timelines
+        of followers like subscribing does.
+        """
+        followers = {}
+        for _, author_id in self.subscriptions:
+            followers[author_id] = followers.get(author_id, 0) + 1
+        latest = {}
+        for recipe_id, author_id, pub_date in zip(
+                reversed(self.recipe_ids), reversed(self.authors),
+                reversed(self.pub_dates)):
+            recipes = latest.setdefault(author_id, [])
+            if len(recipes) < FEED_BACKFILL_SIZE:
+                recipes.append((recipe_id, pub_date))
+        adapt = connection.ops.adapt_datetimefield_value
+        rows = (
+            (user_id, recipe_id, author_id, adapt(pub_date))
+            for user_id, author_id in self.subscriptions
+            if followers[author_id] <= FEED_FANOUT_LIMIT
+            for recipe_id, pub_date in latest.get(author_id, ()))
+        self.report('Ленты подписок', lambda: insert(
+            TimelineEntry, ('user', 'recipe', 'author', 'pub_date'),
+            rows, self.options['batch_size']))
+
+    def update_counters(self):
+        call_command('recalculate_counters', verbosity=0,
+                     stdout=io.StringIO())
+
+    def mark_pulled_authors(self):
+        """
+        Method for marking authors with more than FEED_FANOUT_LIMIT
+        followers and their recipes as not fanned out, timelines of their
+        followers are not filled like for recipes published by them.
+        """
+        authors = User.objects.filter(
+            pk__gte=self.user_ids[0], followers_count__gt=FEED_FANOUT_LIMIT)
+        authors.update(feed_pulled=True)
+        return Recipe.objects.filter(
+            pk__gte=self.first_recipe_id, author__in=authors,
+        ).update(fanned_out=False)
+
+    def refresh_rankings(self, command):
+        return lambda: call_command(
+            command, batch_size=self.options['batch_size'],
+            stdout=io.StringIO())
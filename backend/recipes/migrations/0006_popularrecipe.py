@@ -0,0 +1,30 @@
+# Generated by Django 4.2.5 on 2026-10-18 04:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularRecipe',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('score', models.PositiveIntegerField(default=0, verbose_name='Рейтинг')),
+                ('favorites_count', models.PositiveIntegerField(default=0, verbose_name='Количество добавлений в Избранное')),
+                ('shopping_cart_count', models.PositiveIntegerField(default=0, verbose_name='Количество добавлений в Список покупок')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Популярный рецепт',
+                'verbose_name_plural': 'Популярные рецепты',
+                'ordering': ('-score',),
+                'indexes': [models.Index(fields=['-score', 'recipe'], name='popular_recipe_score_idx')],
+            },
+        ),
+    ]
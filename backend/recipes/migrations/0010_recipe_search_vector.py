@@ -0,0 +1,43 @@
+# Generated by Django 4.2.5 on 2026-10-18 04:54
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_INDEX = (
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+    'ON recipes_recipe USING gin (search_vector)'
+)
+FILL_SEARCH_VECTOR = (
+    "UPDATE recipes_recipe SET search_vector = "
+    "setweight(to_tsvector('russian', COALESCE(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', COALESCE(text, '')), 'B')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(FILL_SEARCH_VECTOR)
+    schema_editor.execute(CREATE_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.5 on 2026-10-18 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_catalogueversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredientsChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField(null=True, verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Изменение ингредиентов рецепта',
+                'verbose_name_plural': 'Изменения ингредиентов рецептов',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.5 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+FANOUT_LIMIT = 10000
+
+
+def mark_pulled_authors(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    authors = User.objects.filter(followers_count__gt=FANOUT_LIMIT)
+    authors.update(feed_pulled=True)
+    Recipe.objects.filter(author__in=authors).update(fanned_out=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipeingredientschange'),
+        ('users', '0005_user_feed_pulled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='fanned_out',
+            field=models.BooleanField(default=True, editable=False, verbose_name='Разослан по лентам подписчиков'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('fanned_out', False)), fields=['author', '-pub_date'], name='recipe_pulled_author_idx'),
+        ),
+        migrations.RunPython(mark_pulled_authors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.5 on 2026-10-18 14:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_recipe_fanned_out'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='RecipeIngredientsChange',
+            new_name='RecipeChange',
+        ),
+        migrations.AlterModelOptions(
+            name='recipechange',
+            options={'verbose_name': 'Изменение рецепта', 'verbose_name_plural': 'Изменения рецептов'},
+        ),
+    ]
@@ -1,12 +1,18 @@
 from colorfield import fields
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch, Q,
+                              Value)
 
 from foodgram.constants import (MAX_LENGHT_COLOR, MAX_LENGHT_MEASUREMENT,
                                 MAX_LENGHT_NAME, MAX_LENGHT_SLUG,
                                 MAX_LIMIT_AMOUNT, MAX_LIMIT_COOKING_TIME,
-                                MIN_LIMIT_AMOUNT, MIN_LIMIT_COOKING_TIME)
+                                MIN_LIMIT_AMOUNT, MIN_LIMIT_COOKING_TIME,
+                                RECIPE_CHANGES_LOG_SIZE, SEARCH_CONFIG)
+from users.models import Subscription
 
 User = get_user_model()
 
@@ -54,6 +60,66 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """
+    QuerySet for fetching recipes with all related data in a fixed
+    number of queries.
+    """
+    def with_user_flags(self, user):
+        """
+        Annotate recipes with 'is_favorited' and 'is_in_shopping_cart'.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()))
+        return self.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                recipe=OuterRef('pk'), user=user)),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                recipe=OuterRef('pk'), user=user)))
+
+    def with_related(self, user):
+        """
+        Prefetch author (annotated with 'is_subscribed'), tags and
+        ingredients of recipes.
+        """
+        if user.is_authenticated:
+            is_subscribed = Exists(Subscription.objects.filter(
+                author=OuterRef('pk'), user=user))
+        else:
+            is_subscribed = Value(False, output_field=BooleanField())
+        return self.prefetch_related(
+            Prefetch('author', queryset=User.objects.annotate(
+                is_subscribed=is_subscribed)),
+            'tags',
+            Prefetch('recipe_ingredients',
+                     queryset=IngredientInRecipe.objects.select_related(
+                         'ingredient')),
+        ).with_user_flags(user)
+
+    def search(self, query):
+        """
+        Filter recipes by full-text query and annotate them with 'rank'.
+        Works only on Postgres.
+        """
+        query = SearchQuery(query, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        return self.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query))
+
+    def update_search_vector(self):
+        """
+        Update 'search_vector' of recipes from name and text.
+        Vectors are kept only on Postgres.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            return
+        self.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)))
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -65,6 +131,10 @@ class Recipe(models.Model):
         max_length=MAX_LENGHT_NAME)
     image = models.ImageField(
         verbose_name='Картинка')
+    image_variants = models.JSONField(
+        verbose_name='Варианты картинки',
+        default=dict,
+        editable=False)
     text = models.TextField(
         verbose_name='Описание')
     ingredients = models.ManyToManyField(
@@ -88,16 +158,81 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True)
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Количество добавлений в Избранное',
+        default=0,
+        editable=False)
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Количество добавлений в Список покупок',
+        default=0,
+        editable=False)
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False)
+    fanned_out = models.BooleanField(
+        verbose_name='Разослан по лентам подписчиков',
+        default=True,
+        editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date', 'name')
+        indexes = [
+            models.Index(fields=['-pub_date', 'id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['-pub_date', 'name'],
+                         name='recipe_pub_date_name_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_pulled_author_idx',
+                         condition=Q(fanned_out=False))]
 
     def __str__(self) -> str:
         return self.name
 
 
+class IngredientInRecipeQuerySet(models.QuerySet):
+    """
+    QuerySet logging recipes changed by bulk operations, which
+    do not send signals.
+    """
+    LOGGED_FIELDS = {'recipe', 'recipe_id', 'ingredient', 'ingredient_id'}
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        RecipeChange.log(*{obj.recipe_id for obj in objs})
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if not self.LOGGED_FIELDS & set(fields):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        objs = list(objs)
+        recipe_ids = set(self.model.objects.filter(
+            pk__in=[obj.pk for obj in objs]).values_list(
+                'recipe_id', flat=True))
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        RecipeChange.log(*recipe_ids | {obj.recipe_id for obj in objs})
+        return rows
+
+    def update(self, **kwargs):
+        if not self.LOGGED_FIELDS & kwargs.keys():
+            return super().update(**kwargs)
+        changed = dict(self.values_list('pk', 'recipe_id'))
+        rows = super().update(**kwargs)
+        RecipeChange.log(*set(changed.values()) | set(
+            self.model.objects.filter(pk__in=changed).values_list(
+                'recipe_id', flat=True)))
+        return rows
+
+
 class IngredientInRecipe(models.Model):
     recipe = models.ForeignKey(
         Recipe,
@@ -126,6 +261,8 @@ class IngredientInRecipe(models.Model):
             fields=['recipe', 'ingredient'],
             name='unique_recipe_ingredient')]
 
+    objects = IngredientInRecipeQuerySet.as_manager()
+
     def __str__(self) -> str:
         return f'{self.recipe} - {self.ingredient}'
 
@@ -148,6 +285,8 @@ class FavoriteRecipe(models.Model):
         constraints = [models.UniqueConstraint(
             fields=['recipe', 'user'],
             name='unique_favorite_recipe')]
+        indexes = [models.Index(fields=['user', 'recipe'],
+                                name='favorite_user_recipe_idx')]
 
     def __str__(self) -> str:
         return f'{self.user} - {self.recipe}'
@@ -171,6 +310,203 @@ class ShoppingCart(models.Model):
         constraints = [models.UniqueConstraint(
             fields=['recipe', 'user'],
             name='unique_shopping_cart_recipe')]
+        indexes = [models.Index(fields=['user', 'recipe'],
+                                name='shopping_cart_user_recipe_idx')]
 
     def __str__(self) -> str:
         return f'{self.user} - {self.recipe}'
+
+
+class PopularRecipe(models.Model):
+    """
+    Materialized ranking of recipes by favorites and shopping carts.
+    Refreshed by command 'refresh_popular_recipes'.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='popularity',
+        primary_key=True,
+        on_delete=models.CASCADE)
+    score = models.PositiveIntegerField(
+        verbose_name='Рейтинг',
+        default=0)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Количество добавлений в Избранное',
+        default=0)
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Количество добавлений в Список покупок',
+        default=0)
+    refreshed_at = models.DateTimeField(
+        verbose_name='Дата обновления',
+        auto_now=True)
+
+    class Meta:
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+        ordering = ('-score',)
+        indexes = [models.Index(fields=['-score', 'recipe'],
+                                name='popular_recipe_score_idx')]
+
+    def __str__(self) -> str:
+        return f'{self.recipe} - {self.score}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Precomputed neighbours of recipe by favorites and shopping carts.
+    Refreshed by command 'build_recommendations'.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='similar_recipes',
+        on_delete=models.CASCADE)
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        related_name='similar_to',
+        on_delete=models.CASCADE)
+    score = models.FloatField(
+        verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe', '-score')
+        constraints = [models.UniqueConstraint(
+            fields=['recipe', 'similar'],
+            name='unique_similar_recipe')]
+        indexes = [models.Index(fields=['recipe', '-score'],
+                                name='similar_recipe_score_idx')]
+
+    def __str__(self) -> str:
+        return f'{self.recipe} - {self.similar}'
+
+
+class RecommendedRecipe(models.Model):
+    """
+    Precomputed recommendations of recipes for user.
+    Refreshed by command 'build_recommendations'.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='recommended_recipes',
+        on_delete=models.CASCADE)
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='recommended_for',
+        on_delete=models.CASCADE)
+    score = models.FloatField(
+        verbose_name='Рейтинг')
+
+    class Meta:
+        verbose_name = 'Рекомендованный рецепт'
+        verbose_name_plural = 'Рекомендованные рецепты'
+        ordering = ('user', '-score')
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'recipe'],
+            name='unique_recommended_recipe')]
+        indexes = [models.Index(fields=['user', '-score'],
+                                name='recommended_recipe_score_idx')]
+
+    def __str__(self) -> str:
+        return f'{self.user} - {self.recipe}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Recipe of followed author in user's feed.
+    Entries are written when recipe is created, recipes of authors with
+    many followers are read from Recipe table instead.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='timeline',
+        on_delete=models.CASCADE)
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='timeline_entries',
+        on_delete=models.CASCADE)
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор рецепта',
+        related_name='+',
+        on_delete=models.CASCADE)
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('user', '-pub_date', '-recipe')
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'recipe'],
+            name='unique_timeline_entry')]
+        indexes = [models.Index(fields=['user', '-pub_date', '-recipe'],
+                                name='timeline_user_pub_date_idx'),
+                   models.Index(fields=['user', 'author'],
+                                name='timeline_user_author_idx')]
+
+    def __str__(self) -> str:
+        return f'{self.user} - {self.recipe}'
+
+
+class CatalogueVersion(models.Model):
+    """
+    Version of catalogue or of user's data used for invalidation of
+    process-local copies and cached responses. Versions are kept in
+    the database, so a bump is seen by all workers and management
+    commands whatever cache backend is used.
+    """
+    name = models.CharField(
+        verbose_name='Название',
+        max_length=MAX_LENGHT_NAME,
+        primary_key=True)
+    version = models.CharField(
+        verbose_name='Версия',
+        max_length=32)
+
+    class Meta:
+        verbose_name = 'Версия каталога'
+        verbose_name_plural = 'Версии каталогов'
+
+    def __str__(self) -> str:
+        return f'{self.name} - {self.version}'
+
+
+class RecipeChange(models.Model):
+    """
+    Log of recipes whose name, text or ingredients were changed.
+    Processes apply new entries to their indexes of recipes instead
+    of rebuilding them. Entry without recipe means that all recipes
+    were changed.
+    """
+    recipe_id = models.BigIntegerField(
+        verbose_name='Рецепт',
+        null=True)
+
+    class Meta:
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Изменения рецептов'
+
+    def __str__(self) -> str:
+        return f'{self.id} - {self.recipe_id}'
+
+    @classmethod
+    def log(cls, *recipe_ids):
+        """
+        Method for logging changed recipes in current transaction,
+        indexes of all processes apply them on next read.
+        Old entries are deleted every RECIPE_CHANGES_LOG_SIZE entries.
+        """
+        changes = cls.objects.bulk_create(
+            [cls(recipe_id=recipe_id) for recipe_id in recipe_ids])
+        for change in changes:
+            if change.id and change.id % RECIPE_CHANGES_LOG_SIZE == 0:
+                cls.objects.filter(
+                    id__lte=change.id - RECIPE_CHANGES_LOG_SIZE).delete()
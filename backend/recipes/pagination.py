@@ -1,8 +1,173 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
 
-from foodgram.constants import PAGE_SIZE
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram.constants import MAX_PAGE_SIZE, PAGE_SIZE
 
 
 class PageNumberLimitPagination(PageNumberPagination):
     page_size = PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    """
+    Class for cursor pagination by values of ordering fields.
+    Next page is fetched with condition on the last object of the page,
+    so deep pages cost the same as the first one and are not shifted
+    by new objects. Ordering is taken from attribute 'cursor_ordering'
+    of view, last field of ordering must be unique.
+    Count is returned only with parameter 'count' ('exact' or 'estimate').
+    """
+    page_size = PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request, queryset, ordering):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            return [
+                queryset.model._meta.get_field(
+                    field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, values)]
+        except (ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def encode_values(values):
+        return urlsafe_b64encode(json.dumps(
+            list(values), default=str).encode()).decode()
+
+    def encode_cursor(self, obj, ordering):
+        return self.encode_values(
+            getattr(obj, field.lstrip('-')) for field in ordering)
+
+    @staticmethod
+    def after(ordering, values):
+        """
+        Method for getting condition for objects placed after 'values'.
+        """
+        conditions = []
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = {
+                previous.lstrip('-'): value
+                for previous, value in zip(ordering[:index], values)}
+            condition[f'{field.lstrip("-")}__{lookup}'] = values[index]
+            conditions.append(Q(**condition))
+        return reduce(or_, conditions)
+
+    def get_count(self, queryset, mode):
+        if mode == 'exact':
+            return queryset.count()
+        if (mode == 'estimate'
+                and connections[queryset.db].vendor == 'postgresql'):
+            match = re.search(r'rows=(\d+)', queryset.order_by().explain())
+            if match:
+                return int(match.group(1))
+            return None
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = view.cursor_ordering
+        self.request = request
+        self.count = self.get_count(
+            queryset, request.query_params.get(self.count_query_param))
+        queryset = queryset.order_by(*ordering)
+        values = self.decode_cursor(request, queryset, ordering)
+        if values is not None:
+            queryset = queryset.filter(self.after(ordering, values))
+        page_size = self.get_page_size(request)
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1], ordering)
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+
+class TimelinePagination(KeysetPagination):
+    """
+    Class for cursor pagination of user's feed.
+    Keys (pub_date, id) of the page are taken from method 'get_timeline'
+    of view, only recipes of the page are fetched from queryset.
+    """
+    ordering = ('-pub_date', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count = None
+        values = self.decode_cursor(request, queryset, self.ordering)
+        page_size = self.get_page_size(request)
+        keys = view.get_timeline(values, page_size + 1)
+        self.next_cursor = None
+        if len(keys) > page_size:
+            keys = keys[:page_size]
+            self.next_cursor = self.encode_values(keys[-1])
+        recipes = queryset.in_bulk([recipe_id for _, recipe_id in keys])
+        return [recipes[recipe_id] for _, recipe_id in keys
+                if recipe_id in recipes]
+
+
+class PageNumberOrCursorPagination(PageNumberLimitPagination):
+    """
+    Class for page number pagination with opt-in keyset pagination.
+    Keyset pagination is used when parameter 'cursor' is passed
+    (empty for the first page) and view has 'cursor_ordering'.
+    """
+    cursor_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if (self.cursor_pagination_class.cursor_query_param
+                in request.query_params
+                and getattr(view, 'cursor_ordering', None)):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,50 @@
+import io
+from pathlib import Path
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from foodgram.constants import PDF_FONT_SIZE
+
+FONT_NAME = 'FreeSans'
+FONT_PATH = Path(__file__).resolve().parent / 'fonts' / 'FreeSans.ttf'
+LEADING = PDF_FONT_SIZE * 1.2
+MARGIN = inch
+
+
+def register_fonts():
+    """
+    Function for registering fonts once per process.
+    """
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def render_shopping_list(lines, title):
+    """
+    Function for rendering shopping list to pdf split into pages.
+    """
+    register_fonts()
+    width, height = letter
+    wrapped_lines = []
+    for line in [title, *lines]:
+        wrapped_lines.extend(simpleSplit(
+            line, FONT_NAME, PDF_FONT_SIZE, width - 2 * MARGIN) or [''])
+    lines_per_page = int((height - 2 * MARGIN) // LEADING)
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter, bottomup=0)
+    for start in range(0, len(wrapped_lines), lines_per_page):
+        textobj = pdf.beginText()
+        textobj.setTextOrigin(MARGIN, MARGIN)
+        textobj.setFont(FONT_NAME, PDF_FONT_SIZE, LEADING)
+        for line in wrapped_lines[start:start + lines_per_page]:
+            textobj.textLine(line)
+        pdf.drawText(textobj)
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
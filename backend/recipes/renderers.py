@@ -0,0 +1,103 @@
+import csv
+import hashlib
+import json
+
+from django.core.cache import cache
+from rest_framework import renderers
+
+from foodgram.constants import (SHOPPING_CART_CACHE_TIMEOUT,
+                                SHOPPING_CART_CHUNK_SIZE)
+
+SHOPPING_CART_TITLE = 'Cписок покупок:'
+
+
+class Echo:
+    """
+    File-like object which returns written value instead of storing it.
+    """
+    def write(self, value):
+        return value
+
+
+class ShoppingCartRenderer(renderers.BaseRenderer):
+    """
+    Base class for rendering shopping cart as text lines.
+    Rows of shopping cart are tuples (name, measurement_unit, amount).
+    Subclasses override format_line() or stream() for other formats.
+    """
+    charset = 'utf-8'
+
+    @property
+    def filename(self):
+        return f'shopping_cart.{self.format}'
+
+    @staticmethod
+    def format_line(row):
+        name, measurement_unit, amount = row
+        return f'- {name} ({measurement_unit}) - {amount}'
+
+    def stream(self, rows):
+        """
+        Method for lazily generating chunks of shopping cart file,
+        one chunk per line.
+        """
+        yield f'{SHOPPING_CART_TITLE}\n'.encode(self.charset)
+        for row in rows:
+            yield f'{self.format_line(row)}\n'.encode(self.charset)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.stream(data))
+
+
+class ShoppingCartTXTRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('name', 'measurement_unit', 'amount')).encode(self.charset)
+        for row in rows:
+            yield writer.writerow(row).encode(self.charset)
+
+
+class ShoppingCartJSONRenderer(ShoppingCartRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def stream(self, rows):
+        separator = '['
+        for name, measurement_unit, amount in rows:
+            yield separator.encode() + json.dumps(
+                {'name': name, 'measurement_unit': measurement_unit,
+                 'amount': amount}, ensure_ascii=False).encode()
+            separator = ','
+        yield b'[]' if separator == '[' else b']'
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def stream(self, rows):
+        """
+        Method for streaming pdf file.
+        Rendered files are cached by hash of the list of ingredients.
+        """
+        lines = [self.format_line(row) for row in rows]
+        cache_key = 'shopping_cart_pdf:' + hashlib.sha256(
+            '\n'.join(lines).encode()).hexdigest()
+        pdf = cache.get(cache_key)
+        if pdf is None:
+            from recipes.pdf import render_shopping_list
+            pdf = render_shopping_list(lines, title=SHOPPING_CART_TITLE)
+            cache.set(cache_key, pdf, SHOPPING_CART_CACHE_TIMEOUT)
+        for start in range(0, len(pdf), SHOPPING_CART_CHUNK_SIZE):
+            yield pdf[start:start + SHOPPING_CART_CHUNK_SIZE]
@@ -0,0 +1,42 @@
+import hashlib
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from foodgram.constants import RECIPES_LIST_CACHE_TIMEOUT
+from recipes.catalogue import INGREDIENTS, RECIPES, TAGS, get_request_versions
+
+
+class CachedListMixin:
+    """
+    Mixin for caching list responses for anonymous users.
+    Responses are cached by normalized query parameters and invalidated
+    by bumping versions of recipes, tags and ingredients catalogues.
+    Authenticated users are not cached because their flags
+    'is_favorited', 'is_in_shopping_cart' and 'is_subscribed' differ.
+    """
+    list_cache_versions = (RECIPES, TAGS, INGREDIENTS)
+    list_cache_timeout = RECIPES_LIST_CACHE_TIMEOUT
+
+    def get_list_cache_key(self, request):
+        query = sorted(
+            (key, sorted(values))
+            for key, values in request.GET.lists())
+        parts = (
+            request.get_host(), request.path,
+            getattr(request.accepted_renderer, 'format', None), query,
+            get_request_versions(request, *self.list_cache_versions))
+        return 'list_response:' + hashlib.sha1(
+            repr(parts).encode()).hexdigest()
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        key = self.get_list_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.list_cache_timeout)
+        return response
@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.db import transaction
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, validators
 from rest_framework.exceptions import ValidationError
 
+from recipes.catalogue import get_ingredients_catalogue
+from recipes.images import (ImageVariantsField, LimitedBase64ImageField,
+                            schedule_variants)
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
                             Recipe, ShoppingCart, Tag)
 from users.serializers import UserRetrieveSerializer
@@ -90,8 +93,9 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
     """
     Serializer for creating instance of IngredientInRecipe Model
     (POST method).
+    Ingredients are resolved by ids in RecipeCreateSerializer.
     """
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
 
     class Meta:
         model = IngredientInRecipe
@@ -108,17 +112,20 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    images = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
-                  'name', 'image', 'text', 'cooking_time',
+                  'name', 'image', 'images', 'text', 'cooking_time',
                   'is_in_shopping_cart', 'is_favorited')
 
     def get_is_favorited(self, obj):
         """
         Method for defining favorite recipes.
         """
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and FavoriteRecipe.objects.filter(
@@ -129,6 +136,8 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
         """
         Method for defining recipes in shopping cart.
         """
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and ShoppingCart.objects.filter(
@@ -140,12 +149,36 @@ class RecipeSerializer(serializers.ModelSerializer):
     """
     Serializer for Recipe Model (GET methods).
     """
+    images = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
         read_only_fields = ('name', 'cooking_time')
 
 
+class RecipeCoverageSerializer(RecipeSerializer):
+    """
+    Serializer for Recipe Model with share of available ingredients
+    (GET method).
+    Available ingredients are passed in context 'ingredients'.
+    """
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'coverage', 'missing_ingredients')
+
+    def get_missing_ingredients(self, obj):
+        available = self.context.get('ingredients', ())
+        return IngredientSerializer(
+            [ingredient.ingredient
+             for ingredient in obj.recipe_ingredients.all()
+             if ingredient.ingredient_id not in available],
+            many=True).data
+
+
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating or updating instance of Recipe Model
@@ -153,9 +186,9 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     """
     ingredients = IngredientInRecipeSerializer(source='recipe_ingredients',
                                                many=True, write_only=True)
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True, write_only=True)
-    image = Base64ImageField()
+    tags = serializers.ListField(child=serializers.IntegerField(),
+                                 write_only=True)
+    image = LimitedBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -163,35 +196,74 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                   'image', 'text', 'cooking_time')
 
     def validate(self, data):
-        ingredients = data.get('recipe_ingredients')
-        tags = data.get('tags')
+        if not self.partial or 'recipe_ingredients' in data:
+            self.check_ingredients(data.get('recipe_ingredients'))
+        if not self.partial or 'tags' in data:
+            data['tags'] = self.check_tags(data.get('tags'))
+        return data
 
+    def check_ingredients(self, ingredients):
+        """
+        Method for checking ingredients and replacing ids with instances.
+        """
         if not ingredients:
             raise ValidationError(
                 {'errors': 'В рецепте отсутствуют ингредиенты.'})
-        if not tags:
-            raise ValidationError(
-                {'errors': 'В рецепте отсутствуют теги.'})
 
-        ingredients_list = []
+        ingredient_ids = [ingredient['id'] for ingredient in ingredients]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise ValidationError(
+                {'errors': 'Данный ингредиент уже добавлен в рецепт.'})
         for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            if ingredient_id in ingredients_list:
-                raise ValidationError(
-                    {'errors': 'Данный ингредиент уже добавлен в рецепт.'})
             if int(ingredient['amount']) <= 0:
                 raise ValidationError(
                     {'amount': 'Количество должно быть больше 0'})
-            ingredients_list.append(ingredient_id)
 
-        tags_list = []
-        for tag in tags:
-            if tag in tags_list:
-                raise ValidationError(
-                    {'errors': 'Данный тег уже добавлен в рецепт.'})
-            tags_list.append(tag)
+        ingredients_by_id = self.get_ingredients(ingredient_ids)
+        missing_ingredients = [ingredient_id
+                               for ingredient_id in ingredient_ids
+                               if ingredient_id not in ingredients_by_id]
+        if missing_ingredients:
+            raise ValidationError({'errors': (
+                'Ингредиенты не найдены: '
+                f'{", ".join(map(str, missing_ingredients))}.')})
+        for ingredient in ingredients:
+            ingredient['id'] = ingredients_by_id[ingredient['id']]
 
-        return data
+    @staticmethod
+    def check_tags(tags):
+        """
+        Method for checking tags and getting their instances.
+        """
+        if not tags:
+            raise ValidationError(
+                {'errors': 'В рецепте отсутствуют теги.'})
+        if len(set(tags)) != len(tags):
+            raise ValidationError(
+                {'errors': 'Данный тег уже добавлен в рецепт.'})
+
+        tags_by_id = Tag.objects.in_bulk(tags)
+        missing_tags = [tag_id for tag_id in tags
+                        if tag_id not in tags_by_id]
+        if missing_tags:
+            raise ValidationError({'errors': (
+                f'Теги не найдены: {", ".join(map(str, missing_tags))}.')})
+        return [tags_by_id[tag_id] for tag_id in tags]
+
+    @staticmethod
+    def get_ingredients(ingredient_ids):
+        """
+        Method for getting ingredients by ids with one lookup.
+        """
+        if not settings.INGREDIENTS_CATALOGUE_CACHE:
+            return Ingredient.objects.in_bulk(ingredient_ids)
+        catalogue = get_ingredients_catalogue()
+        ingredients = {}
+        for ingredient_id in ingredient_ids:
+            ingredient = catalogue.get_instance(ingredient_id)
+            if ingredient is not None:
+                ingredients[ingredient_id] = ingredient
+        return ingredients
 
     def validate_image(self, value):
         if not value:
@@ -210,24 +282,60 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags_data)
         self.ingredients_index(recipe, ingredients_data)
+        schedule_variants(recipe)
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
         """
         Method for updating recipe.
+        Ingredients and tags are changed only if they are passed.
         """
-        ingredients_data = validated_data.pop('recipe_ingredients')
-        instance.ingredients.clear()
-        self.ingredients_index(instance, ingredients_data)
-        instance.tags.clear()
-        instance.tags.set(validated_data.pop('tags'))
-        return super().update(instance, validated_data)
+        ingredients_data = validated_data.pop('recipe_ingredients', None)
+        tags_data = validated_data.pop('tags', None)
+        if ingredients_data is not None:
+            self.update_ingredients(instance, ingredients_data)
+        if tags_data is not None:
+            instance.tags.set(tags_data)
+        instance = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            schedule_variants(instance)
+        return instance
+
+    @staticmethod
+    def update_ingredients(recipe, ingredients_data):
+        """
+        Method for updating only changed ingredients of recipe.
+        """
+        current = {ingredient.ingredient_id: ingredient
+                   for ingredient in recipe.recipe_ingredients.all()}
+        amounts = {ingredient['id'].id: ingredient['amount']
+                   for ingredient in ingredients_data}
+
+        deleted_ids = current.keys() - amounts.keys()
+        if deleted_ids:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=deleted_ids).delete()
+
+        changed = []
+        for ingredient_id, ingredient in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and ingredient.amount != amount:
+                ingredient.amount = amount
+                changed.append(ingredient)
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ('amount',))
+
+        RecipeCreateSerializer.ingredients_index(
+            recipe, [ingredient for ingredient in ingredients_data
+                     if ingredient['id'].id not in current])
 
     def to_representation(self, instance):
         """
         Method for getting response after creating or updating recipe.
         """
+        instance = Recipe.objects.with_related(
+            self.context.get('request').user).get(pk=instance.pk)
         serializer = RecipeRetrieveSerializer(instance,
                                               context=self.context)
         return serializer.data
@@ -242,4 +350,5 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             ingredients_index.append(IngredientInRecipe(
                 recipe=recipe, ingredient=ingredient['id'],
                 amount=ingredient['amount']))
-        IngredientInRecipe.objects.bulk_create(ingredients_index)
+        if ingredients_index:
+            IngredientInRecipe.objects.bulk_create(ingredients_index)
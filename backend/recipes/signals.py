@@ -0,0 +1,182 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes import timeline
+from recipes.catalogue import (INGREDIENTS, RECIPES, TAGS,
+                               bump_version_on_commit, user_version)
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
+                            Recipe, RecipeChange, ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredients_catalogue(**kwargs):
+    """
+    Function for invalidating ingredients catalogue on changes.
+    """
+    bump_version_on_commit(INGREDIENTS)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tags_catalogue(**kwargs):
+    """
+    Function for invalidating tags catalogue on changes.
+    """
+    bump_version_on_commit(TAGS)
+
+
+@receiver([post_save, post_delete], sender=FavoriteRecipe)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@receiver([post_save, post_delete], sender=Subscription)
+def invalidate_user_version(instance, **kwargs):
+    """
+    Function for invalidating responses which depend on user's favorites,
+    shopping cart and subscriptions.
+    """
+    bump_version_on_commit(user_version(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=IngredientInRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes(**kwargs):
+    """
+    Function for invalidating cached recipes lists on changes.
+    """
+    bump_version_on_commit(RECIPES)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def log_recipe_change(instance, **kwargs):
+    """
+    Function for logging saved or deleted recipe for indexes of recipes.
+    """
+    RecipeChange.log(instance.id)
+
+
+def change_recipes(*recipe_ids):
+    """
+    Function for logging recipes whose ingredients are changed and
+    for changing their modification time, so ETag and Last-Modified
+    of recipes change with their ingredients.
+    """
+    RecipeChange.log(*recipe_ids)
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=IngredientInRecipe)
+def change_previous_recipe(instance, raw=False, **kwargs):
+    """
+    Function for changing recipe which ingredient is moved from.
+    """
+    if not instance._state.adding and not raw:
+        recipe_ids = list(IngredientInRecipe.objects.filter(
+            pk=instance.pk).exclude(recipe_id=instance.recipe_id).values_list(
+                'recipe_id', flat=True))
+        if recipe_ids:
+            change_recipes(*recipe_ids)
+
+
+@receiver([post_save, post_delete], sender=IngredientInRecipe)
+def change_recipe(instance, **kwargs):
+    """
+    Function for changing recipe whose ingredients are changed,
+    deleted ingredients of deleted recipes and ingredients included.
+    """
+    change_recipes(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_vector(instance, update_fields=None, **kwargs):
+    """
+    Function for updating search vector of recipe after its name
+    or text could be changed.
+    """
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+def change_counter(queryset, field, delta):
+    """
+    Function for changing counter 'field' in the database with F().
+    Counters are never decreased below zero.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(User.objects.filter(pk=instance.author_id),
+                       'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(instance, **kwargs):
+    change_counter(User.objects.filter(pk=instance.author_id),
+                   'recipes_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def increase_followers_count(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(User.objects.filter(pk=instance.author_id),
+                       'followers_count', 1)
+        timeline.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrease_followers_count(instance, **kwargs):
+    change_counter(User.objects.filter(pk=instance.author_id),
+                   'followers_count', -1)
+    timeline.unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Recipe)
+def choose_fan_out(instance, raw=False, **kwargs):
+    """
+    Function for choosing if new recipe is written to followers'
+    timelines or read from Recipe table.
+    """
+    if instance._state.adding and not raw:
+        instance.fanned_out = timeline.is_pushed(instance.author)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, raw=False, **kwargs):
+    """
+    Function for writing new recipe to followers' timelines after
+    it is committed.
+    """
+    if created and not raw:
+        transaction.on_commit(partial(timeline.fan_out, instance))
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCart)
+def increase_recipe_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                       RECIPE_COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_recipe_counter(sender, instance, **kwargs):
+    change_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                   RECIPE_COUNTERS[sender], -1)
+
+
+RECIPE_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
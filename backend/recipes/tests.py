@@ -0,0 +1,787 @@
+import json
+import re
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes import async_views, catalogue
+from recipes.catalogue import (INGREDIENTS, RECIPES, TAGS,
+                               get_ingredients_catalogue,
+                               get_recipe_ingredients_index,
+                               get_recipes_search_index, get_tags_map,
+                               get_versions, user_version)
+from recipes.management.commands.import_ingredients import (read_csv,
+                                                            read_json,
+                                                            read_ndjson)
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientInRecipe,
+                            PopularRecipe, Recipe, RecommendedRecipe,
+                            ShoppingCart, SimilarRecipe, Tag, TimelineEntry)
+from recipes.timeline import get_feed
+from users.models import Subscription, User
+
+
+class RecipeListQueriesTest(TestCase):
+    """
+    Class for checking that number of queries of recipes list
+    does not depend on number of recipes on page.
+    """
+    LIMIT = 100
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [
+            User.objects.create_user(
+                email=f'author{number}@foodgram.ru',
+                username=f'author{number}', first_name='Автор',
+                last_name=str(number), password='password')
+            for number in range(5)]
+        cls.user = authors[0]
+        tags = [Tag.objects.create(name=f'Тег {number}',
+                                   color=f'#00000{number}',
+                                   slug=f'tag{number}')
+                for number in range(3)]
+        ingredients = [Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(10)]
+        for number in range(cls.LIMIT):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png')
+            recipe.tags.set(tags[:1 + number % len(tags)])
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient=ingredients[(number + shift) % 10],
+                    amount=shift + 1)
+                for shift in range(3))
+            FavoriteRecipe.objects.create(recipe=recipe, user=cls.user)
+            if number % 2:
+                ShoppingCart.objects.create(recipe=recipe, user=cls.user)
+        for author in authors[1:]:
+            Subscription.objects.create(user=cls.user, author=author)
+        get_versions(RECIPES, TAGS, INGREDIENTS, user_version(cls.user.id))
+
+    def setUp(self):
+        cache.clear()
+        get_tags_map()
+        self.client = APIClient()
+
+    def get_list(self):
+        response = self.client.get(f'/api/recipes/?limit={self.LIMIT}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), self.LIMIT)
+        return response
+
+    def test_anonymous_list_queries(self):
+        with self.assertNumQueries(7):
+            self.get_list()
+
+    def test_cached_anonymous_list_queries(self):
+        self.get_list()
+        with self.assertNumQueries(1):
+            self.get_list()
+
+    def test_authenticated_list_queries(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(8):
+            response = self.get_list()
+        recipe = response.data['results'][0]
+        self.assertTrue(recipe['is_favorited'])
+        self.assertTrue(recipe['author']['is_subscribed'])
+
+
+def create_user(name):
+    return User.objects.create_user(
+        email=f'{name}@foodgram.ru', username=name, first_name='Имя',
+        last_name='Фамилия', password='password')
+
+
+@mock.patch('recipes.timeline.FEED_FANOUT_LIMIT', 2)
+@mock.patch('recipes.timeline.FEED_PUSH_LIMIT', 2)
+class FeedFanOutTest(TestCase):
+    """
+    Class for checking that feeds keep recipes when author crosses
+    the fan out limit in both directions.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.followers = [create_user(f'follower{number}')
+                         for number in range(4)]
+
+    def subscribe(self, follower):
+        Subscription.objects.create(user=follower, author=self.author)
+        self.author.refresh_from_db()
+
+    def unsubscribe(self, follower):
+        Subscription.objects.get(user=follower, author=self.author).delete()
+        self.author.refresh_from_db()
+
+    def publish(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Recipe.objects.create(
+                author=self.author, name=name, text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png')
+
+    def assertFeed(self, follower, recipes):
+        self.assertEqual([recipe_id for _, recipe_id in get_feed(follower)],
+                         [recipe.id for recipe in reversed(recipes)])
+
+    def test_crossing_fan_out_limit(self):
+        first, second, third, fourth = self.followers
+        self.subscribe(first)
+        self.subscribe(second)
+        pushed = self.publish('Разослан до порога')
+        self.assertTrue(pushed.fanned_out)
+        self.assertEqual(TimelineEntry.objects.filter(
+            recipe=pushed).count(), 2)
+
+        self.subscribe(third)
+        self.assertTrue(self.author.feed_pulled)
+        pulled = self.publish('Не разослан')
+        self.assertFalse(pulled.fanned_out)
+        self.assertFalse(TimelineEntry.objects.filter(recipe=pulled).exists())
+        for follower in (first, second, third):
+            self.assertFeed(follower, [pushed, pulled])
+
+        self.unsubscribe(third)
+        self.assertTrue(self.author.feed_pulled)
+        self.assertFeed(first, [pushed, pulled])
+
+        self.unsubscribe(second)
+        self.assertFalse(self.author.feed_pulled)
+        self.assertFeed(first, [pushed, pulled])
+        self.assertFeed(second, [])
+
+        pushed_again = self.publish('Разослан после порога')
+        self.assertTrue(pushed_again.fanned_out)
+        self.subscribe(fourth)
+        self.assertFalse(self.author.feed_pulled)
+        for follower in (first, fourth):
+            self.assertFeed(follower, [pushed, pulled, pushed_again])
+
+
+class RecipeIndexesTest(TestCase):
+    """
+    Class for checking that process-local indexes of recipes apply
+    changes, cascade deletes included, without rebuilding.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.other = create_user('other')
+        cls.ingredients = [Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)]
+        cls.recipe = cls.create_recipe(cls.author, 'Борщ', [0, 1])
+        cls.other_recipe = cls.create_recipe(cls.other, 'Щи', [1, 2])
+
+    @classmethod
+    def create_recipe(cls, author, name, ingredients):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text='Суп',
+            cooking_time=10, image='recipes/images/recipe.png')
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe,
+                               ingredient=cls.ingredients[number], amount=1)
+            for number in ingredients)
+        return recipe
+
+    def setUp(self):
+        catalogue._recipe_indexes.clear()
+        self.search_index = get_recipes_search_index()
+        self.ingredients_index = get_recipe_ingredients_index()
+
+    def assertSearch(self, words, recipes):
+        self.assertIs(get_recipes_search_index(), self.search_index)
+        self.assertEqual(set(self.search_index.search(words)),
+                         {recipe.id for recipe in recipes})
+
+    def assertCookable(self, ingredient, recipes):
+        self.assertIs(get_recipe_ingredients_index(), self.ingredients_index)
+        self.assertEqual(
+            [recipe_id for recipe_id, *_ in self.ingredients_index.rank(
+                [ingredient.id])], [recipe.id for recipe in recipes])
+
+    def test_recipe_changes(self):
+        self.assertSearch('суп', [self.recipe, self.other_recipe])
+        self.recipe.text = 'Свекольный'
+        self.recipe.save()
+        self.assertSearch('суп', [self.other_recipe])
+        self.assertSearch('борщ свекольный', [self.recipe])
+        IngredientInRecipe.objects.filter(
+            recipe=self.recipe, ingredient=self.ingredients[1]).update(
+                ingredient=self.ingredients[2])
+        self.assertCookable(self.ingredients[1], [self.other_recipe])
+        self.assertCookable(self.ingredients[2],
+                            [self.recipe, self.other_recipe])
+
+    def test_cascade_deletes(self):
+        self.ingredients[1].delete()
+        self.assertCookable(self.ingredients[1], [])
+        self.assertCookable(self.ingredients[2], [self.other_recipe])
+        self.other.delete()
+        self.assertCookable(self.ingredients[2], [])
+        self.assertCookable(self.ingredients[0], [self.recipe])
+        self.assertSearch('суп', [self.recipe])
+
+
+class RecipeResponsesTest(TestCase):
+    """
+    Class for checking that ETags and cached lists of recipes change
+    after recipes, tags and ingredients are changed.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.tag = Tag.objects.create(name='Тег', color='#000000',
+                                     slug='tag')
+        cls.ingredient = Ingredient.objects.create(
+            name='Ингредиент', measurement_unit='г')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png')
+        cls.recipe.tags.set([cls.tag])
+        cls.recipe_ingredient = IngredientInRecipe.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=1)
+
+    def setUp(self):
+        cache.clear()
+        get_tags_map()
+        self.client = APIClient()
+
+    def get_recipe(self, client=None):
+        response = (client or self.client).get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0]
+
+    def assertChanged(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response.data
+
+    def test_not_modified_until_changed(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        admin = create_user('admin')
+        admin.is_staff = admin.is_superuser = True
+        admin.save()
+        client = Client()
+        client.force_login(admin)
+        response = client.post(
+            reverse('admin:recipes_ingredientinrecipe_change',
+                    args=[self.recipe_ingredient.id]),
+            {'recipe': self.recipe.id, 'ingredient': self.ingredient.id,
+             'amount': 5})
+        self.assertEqual(response.status_code, 302)
+        data = self.assertChanged(url, etag)
+        self.assertEqual(data['ingredients'][0]['amount'], 5)
+
+        etag = self.client.get('/api/recipes/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Новый тег'
+            self.tag.save()
+        data = self.assertChanged('/api/recipes/', etag)
+        self.assertEqual(data['results'][0]['tags'][0]['name'], 'Новый тег')
+
+    def test_cache_invalidation(self):
+        self.get_recipe()
+        with self.assertNumQueries(1):
+            self.get_recipe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Новый рецепт'
+            self.recipe.save()
+        self.assertEqual(self.get_recipe()['name'], 'Новый рецепт')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = 'Новый тег'
+            self.tag.save()
+        self.assertEqual(self.get_recipe()['tags'][0]['name'], 'Новый тег')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.name = 'Новый ингредиент'
+            self.ingredient.save()
+        self.assertEqual(self.get_recipe()['ingredients'][0]['name'],
+                         'Новый ингредиент')
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.get_recipe()
+        Recipe.objects.filter(pk=self.recipe.pk).update(name='Без сигналов')
+        self.assertEqual(self.get_recipe()['name'], 'Рецепт')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(self.get_recipe(client)['name'], 'Без сигналов')
+        self.assertEqual(self.get_recipe()['name'], 'Рецепт')
+
+
+class IngredientSearchTest(TestCase):
+    """
+    Class for checking search of ingredients by beginning of name
+    and ranked search by part of name, with and without catalogue.
+    """
+    NAMES = ('Соль', 'Фасоль', 'Солод', 'Сахар', 'Рассол', 'Соленья')
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in cls.NAMES:
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def search(self, query):
+        response = APIClient().get(f'/api/ingredients/{query}')
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_search_ordering(self):
+        for catalogue_cache in (True, False):
+            with self.subTest(catalogue_cache=catalogue_cache), \
+                    override_settings(
+                        INGREDIENTS_CATALOGUE_CACHE=catalogue_cache):
+                self.assertEqual(self.search('?name=сол'),
+                                 ['Соленья', 'Солод', 'Соль'])
+                self.assertEqual(
+                    self.search('?name=СОЛ&mode=ranked'),
+                    ['Соленья', 'Солод', 'Соль', 'Рассол', 'Фасоль'])
+                self.assertEqual(self.search('?name=ль'), [])
+                self.assertEqual(self.search('?name=ль&mode=ranked'),
+                                 ['Соль', 'Фасоль'])
+
+    def test_catalogue_reloaded_after_version_bump(self):
+        catalogue = get_ingredients_catalogue()
+        self.assertIs(get_ingredients_catalogue(), catalogue)
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Солянка', measurement_unit='г')])
+        self.assertIs(get_ingredients_catalogue(), catalogue)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Солерос', measurement_unit='г')
+        reloaded = get_ingredients_catalogue()
+        self.assertIsNot(reloaded, catalogue)
+        self.assertEqual(len(reloaded), len(catalogue) + 2)
+        self.assertEqual(self.search('?name=соля'), ['Солянка'])
+
+
+class IngredientReadersTest(TestCase):
+    """
+    Class for checking readers of import_ingredients command.
+    """
+    ROWS = [('Соль', 'г'), ('Вода', 'мл')]
+
+    def read(self, reader, text):
+        return list(reader(StringIO(text)))
+
+    def test_csv(self):
+        self.assertEqual(self.read(read_csv, 'Соль,г\n\n,\nВода,мл\n'),
+                         self.ROWS)
+        with self.assertRaisesMessage(CommandError, 'Строка 2'):
+            self.read(read_csv, 'Соль,г\nВода\n')
+
+    @mock.patch('recipes.management.commands.import_ingredients.'
+                'JSON_CHUNK_SIZE', 8)
+    def test_json(self):
+        self.assertEqual(self.read(read_json, json.dumps([
+            {'name': name, 'measurement_unit': unit}
+            for name, unit in self.ROWS], ensure_ascii=False)), self.ROWS)
+        for text, message in (
+                ('{"name": "Соль"}', 'должен содержать список'),
+                ('[{"name": "Соль", "measurement_unit": "г"}, '
+                 '{"name": "Вода"}]', 'Элемент 1'),
+                ('[["Соль", "г"]]', 'Элемент 0'),
+                ('[{"name": "Соль", "measurement_unit": 1}]', 'Элемент 0'),
+                ('[{"name": "Соль"', 'Некорректный JSON')):
+            with self.subTest(text=text), \
+                    self.assertRaisesMessage(CommandError, message):
+                self.read(read_json, text)
+
+    def test_ndjson(self):
+        self.assertEqual(self.read(read_ndjson, (
+            '{"name": "Соль", "measurement_unit": "г"}\n\n'
+            '{"name": "Вода", "measurement_unit": "мл"}\n')), self.ROWS)
+        for text, message in (
+                ('{"name": "Соль", "measurement_unit": "г"}\nnull\n',
+                 'Строка 2'),
+                ('\n{"name": "Соль"}\n', 'Строка 2'),
+                ('{"name": "Соль", ', 'Строка 1: некорректный JSON')):
+            with self.subTest(text=text), \
+                    self.assertRaisesMessage(CommandError, message):
+                self.read(read_ndjson, text)
+
+    def test_import_is_idempotent(self):
+        text = ''.join(
+            json.dumps({'name': name, 'measurement_unit': unit},
+                       ensure_ascii=False) + '\n'
+            for name, unit in self.ROWS)
+        for created in (2, 0):
+            with mock.patch('sys.stdin', StringIO(text)):
+                out = StringIO()
+                call_command('import_ingredients', '-', format='ndjson',
+                             stdout=out)
+            self.assertIn(f'добавлено ингредиентов: {created}',
+                          out.getvalue())
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', 'measurement_unit')),
+            set(self.ROWS))
+
+
+class ShoppingCartDownloadTest(TestCase):
+    """
+    Class for checking that shopping cart pdf is rendered with fonts
+    registered on first use.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png')
+        IngredientInRecipe.objects.create(
+            recipe=recipe, amount=2, ingredient=Ingredient.objects.create(
+                name='Соль', measurement_unit='г'))
+        ShoppingCart.objects.create(recipe=recipe, user=cls.user)
+
+    def test_pdf(self):
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(
+            b''.join(response.streaming_content).startswith(b'%PDF'))
+
+
+class AsyncRecipeListTest(TestCase):
+    """
+    Class for checking that async recipes list returns the same
+    responses as RecipeViewSet.list.
+    """
+    QUERIES = (
+        '', '?limit=2', '?limit=2&page=2', '?limit=2&page=last',
+        '?limit=2&page=10', '?page=abc', '?limit=0', '?tags=tag0',
+        '?tags=tag0&tags=tag1&limit=1', '?tags=unknown', '?author=abc',
+        '?is_favorited=1', '?is_in_shopping_cart=0&limit=3',
+        '?search=рецепт 3')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.token = Token.objects.create(user=cls.user)
+        tags = [Tag.objects.create(name=f'Тег {number}',
+                                   color=f'#00000{number}',
+                                   slug=f'tag{number}')
+                for number in range(2)]
+        for number in range(5):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png')
+            recipe.tags.set(tags[:1 + number % 2])
+            if number % 2:
+                FavoriteRecipe.objects.create(recipe=recipe, user=cls.user)
+
+    def assertSameResponses(self, headers):
+        client = APIClient()
+        client.credentials(**headers)
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                cache.clear()
+                expected = client.get(f'/api/recipes/{query}')
+                cache.clear()
+                response = async_to_sync(async_views.recipes)(
+                    RequestFactory().get(f'/api/recipes/{query}', **headers))
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(json.loads(response.content),
+                                 expected.json())
+                self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+    def test_anonymous_parity(self):
+        self.assertSameResponses({})
+
+    def test_authenticated_parity(self):
+        self.assertSameResponses(
+            {'HTTP_AUTHORIZATION': f'Token {self.token.key}'})
+
+
+class RecipeUpdateTest(TestCase):
+    """
+    Class for checking that recipe update writes only changed
+    ingredients and tags.
+    """
+    WRITES = re.compile(r'^(INSERT|UPDATE|DELETE)\b[^"]*"(\w+)"')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tags = [Tag.objects.create(name=f'Тег {number}',
+                                       color=f'#00000{number}',
+                                       slug=f'tag{number}')
+                    for number in range(3)]
+        cls.ingredients = [Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png')
+        cls.recipe.tags.set(cls.tags[:2])
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=cls.recipe,
+                               ingredient=cls.ingredients[number],
+                               amount=number + 1)
+            for number in range(3))
+
+    def setUp(self):
+        get_ingredients_catalogue()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.rows = self.get_rows()
+
+    def get_rows(self):
+        return {ingredient_id: (pk, amount)
+                for pk, ingredient_id, amount
+                in IngredientInRecipe.objects.filter(
+                    recipe=self.recipe).values_list(
+                        'pk', 'ingredient_id', 'amount')}
+
+    def update(self, amounts, tags=(0, 1)):
+        """
+        Method for updating recipe with 'amounts' by numbers of
+        ingredients, returns writes to ingredients and tags tables
+        and number of queries.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.id}/', {
+                    'ingredients': [
+                        {'id': self.ingredients[number].id, 'amount': amount}
+                        for number, amount in amounts.items()],
+                    'tags': [self.tags[number].id for number in tags]},
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {ingredient_id: amount
+             for ingredient_id, (_, amount) in self.get_rows().items()},
+            {self.ingredients[number].id: amount
+             for number, amount in amounts.items()})
+        self.assertEqual(
+            set(self.recipe.tags.values_list('id', flat=True)),
+            {self.tags[number].id for number in tags})
+        writes = []
+        for query in queries.captured_queries:
+            match = self.WRITES.match(query['sql'])
+            if match and match.group(2) in ('recipes_ingredientinrecipe',
+                                            'recipes_recipe_tags'):
+                writes.append(match.groups())
+        return writes, len(queries.captured_queries)
+
+    def assertKept(self, *numbers):
+        rows = self.get_rows()
+        for number in numbers:
+            ingredient_id = self.ingredients[number].id
+            self.assertEqual(rows[ingredient_id][0],
+                             self.rows[ingredient_id][0])
+
+    def test_unchanged(self):
+        writes, count = self.update({0: 1, 1: 2, 2: 3})
+        self.assertEqual(writes, [])
+        self.assertKept(0, 1, 2)
+        self.assertEqual(count, 18)
+
+    def test_added(self):
+        writes, count = self.update({0: 1, 1: 2, 2: 3, 3: 4}, tags=(0, 1, 2))
+        self.assertEqual(writes, [
+            ('INSERT', 'recipes_ingredientinrecipe'),
+            ('INSERT', 'recipes_recipe_tags')])
+        self.assertKept(0, 1, 2)
+        self.assertEqual(count, 22)
+
+    def test_removed(self):
+        writes, count = self.update({0: 1, 2: 3}, tags=(1,))
+        self.assertEqual(writes, [
+            ('DELETE', 'recipes_ingredientinrecipe'),
+            ('DELETE', 'recipes_recipe_tags')])
+        self.assertKept(0, 2)
+        self.assertEqual(count, 23)
+
+    def test_amount_changed(self):
+        writes, count = self.update({0: 1, 1: 5, 2: 3})
+        self.assertEqual(writes, [('UPDATE', 'recipes_ingredientinrecipe')])
+        self.assertKept(0, 1, 2)
+        self.assertEqual(count, 19)
+
+
+class KeysetPaginationTest(TestCase):
+    """
+    Class for checking cursor pagination of recipes.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        for number in range(7):
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10,
+                image='recipes/images/recipe.png')
+        first = Recipe.objects.order_by('id').first()
+        Recipe.objects.filter(id__lte=first.id + 3).update(
+            pub_date=first.pub_date)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return ([recipe['id'] for recipe in response.data['results']],
+                response.data['next'])
+
+    def get_ordered_ids(self):
+        return list(Recipe.objects.order_by('-pub_date', 'id').values_list(
+            'id', flat=True))
+
+    def test_cursor_round_trip(self):
+        ids, url = [], '/api/recipes/?cursor=&limit=3'
+        while url is not None:
+            page, url = self.get_page(url)
+            self.assertLessEqual(len(page), 3)
+            ids.extend(page)
+        self.assertEqual(ids, self.get_ordered_ids())
+        response = self.client.get('/api/recipes/?cursor=bm90IGpzb24')
+        self.assertEqual(response.status_code, 404)
+
+    def test_stable_pages_with_inserts(self):
+        expected = self.get_ordered_ids()
+        ids, url = self.get_page('/api/recipes/?cursor=&limit=3')
+        while url is not None:
+            Recipe.objects.create(
+                author=self.author, name='Новый рецепт', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png')
+            page, url = self.get_page(url)
+            ids.extend(page)
+        self.assertEqual(ids, expected)
+
+    def test_search_with_cursor(self):
+        response = self.client.get('/api/recipes/?search=рецепт&cursor=')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+        response = self.client.get('/api/recipes/?search=рецепт&limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 7)
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Планы запросов проверяются только на Postgres.')
+class QueryPlansTest(TestCase):
+    """
+    Class for checking that queries of API endpoints do not read large
+    tables by sequential scan. Sequential scans are disabled, so a scan
+    left in a plan means that no index matches the query.
+    """
+    CHECKED_TABLES = {
+        'recipes_recipe',
+        'recipes_recipe_tags',
+        'recipes_favoriterecipe',
+        'recipes_shoppingcart',
+        'recipes_ingredientinrecipe',
+        'recipes_popularrecipe',
+        'recipes_similarrecipe',
+        'recipes_recommendedrecipe',
+        'recipes_timelineentry',
+        'users_subscription',
+        'users_user',
+    }
+    SEQUENTIAL_SCAN = re.compile(r'Seq Scan on (\w+)')
+    DECLARE_CURSOR = re.compile(r'^DECLARE .+? FOR ', re.DOTALL)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        pushed, pulled = create_user('pushed'), create_user('pulled')
+        pulled.feed_pulled = True
+        pulled.save()
+        tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        cls.ingredient = Ingredient.objects.create(
+            name='Ингредиент', measurement_unit='г')
+        for author in (pushed, pulled):
+            Subscription.objects.create(user=cls.user, author=author)
+        previous = None
+        for number in range(4):
+            author = (pushed, pulled)[number % 2]
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png')
+            recipe.tags.set([tag])
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=cls.ingredient, amount=1)
+            FavoriteRecipe.objects.create(recipe=recipe, user=cls.user)
+            ShoppingCart.objects.create(recipe=recipe, user=cls.user)
+            PopularRecipe.objects.create(recipe=recipe, score=number + 1)
+            RecommendedRecipe.objects.create(
+                user=cls.user, recipe=recipe, score=1)
+            if recipe.fanned_out:
+                TimelineEntry.objects.create(
+                    user=cls.user, recipe=recipe, author=author,
+                    pub_date=recipe.pub_date)
+            if previous is not None:
+                SimilarRecipe.objects.create(
+                    recipe=recipe, similar=previous, score=1)
+            previous = recipe
+        cls.recipe = recipe
+        cls.author = pushed
+
+    def setUp(self):
+        get_tags_map()
+        get_recipe_ingredients_index()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def get_urls(self):
+        return (
+            '/api/recipes/',
+            f'/api/recipes/?author={self.author.id}',
+            '/api/recipes/?tags=tag',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+            '/api/recipes/?search=рецепт',
+            '/api/recipes/?cursor=',
+            f'/api/recipes/{self.recipe.id}/',
+            '/api/recipes/popular/',
+            '/api/recipes/feed/',
+            f'/api/recipes/what-to-cook/?ingredients={self.ingredient.id}',
+            f'/api/recipes/{self.recipe.id}/similar/',
+            '/api/recipes/recommended/',
+            '/api/recipes/download_shopping_cart/?format=json',
+            '/api/users/subscriptions/',
+        )
+
+    def get_scanned_tables(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        scanned = set()
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = self.DECLARE_CURSOR.sub('', query['sql'])
+                if not sql.startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                scanned.update(self.SEQUENTIAL_SCAN.findall(plan))
+        return scanned & self.CHECKED_TABLES
+
+    def test_no_sequential_scans(self):
+        for url in self.get_urls():
+            with self.subTest(url=url):
+                self.assertEqual(self.get_scanned_tables(url), set())
@@ -0,0 +1,97 @@
+from itertools import islice
+
+from django.db.models import Q
+
+from foodgram.constants import (FEED_BACKFILL_SIZE, FEED_FANOUT_BATCH_SIZE,
+                                FEED_FANOUT_LIMIT, FEED_PUSH_LIMIT)
+from recipes.models import Recipe, TimelineEntry
+from recipes.pagination import KeysetPagination
+from users.models import Subscription, User
+
+
+def is_pushed(author):
+    """
+    Function for checking if new recipe of author is written to timelines
+    of followers. Recipes of authors with many followers are read
+    from Recipe table. The choice is saved in Recipe.fanned_out,
+    so recipe stays in feeds when the author is switched.
+    """
+    return not author.feed_pulled
+
+
+def fan_out(recipe):
+    """
+    Function for writing new recipe to timelines of author's followers.
+    """
+    if not recipe.fanned_out:
+        return
+    followers = Subscription.objects.filter(
+        author_id=recipe.author_id).values_list('user_id', flat=True)
+    followers = followers.iterator(chunk_size=FEED_FANOUT_BATCH_SIZE)
+    while True:
+        batch = list(islice(followers, FEED_FANOUT_BATCH_SIZE))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, recipe_id=recipe.id,
+                           author_id=recipe.author_id,
+                           pub_date=recipe.pub_date)
+             for user_id in batch],
+            ignore_conflicts=True)
+
+
+def follow(user_id, author_id):
+    """
+    Function for writing latest fanned out recipes of followed author
+    to timeline. Author is switched to pulled recipes when the number
+    of followers exceeds FEED_FANOUT_LIMIT.
+    """
+    recipes = Recipe.objects.filter(
+        author_id=author_id, fanned_out=True,
+    ).order_by('-pub_date', '-id').values_list('id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                       author_id=author_id, pub_date=pub_date)
+         for recipe_id, pub_date in recipes[:FEED_BACKFILL_SIZE]],
+        ignore_conflicts=True)
+    User.objects.filter(
+        pk=author_id, feed_pulled=False,
+        followers_count__gt=FEED_FANOUT_LIMIT).update(feed_pulled=True)
+
+
+def unfollow(user_id, author_id):
+    """
+    Function for removing recipes of author from timeline. Author is
+    switched back to fanned out recipes only when the number of followers
+    falls below FEED_PUSH_LIMIT, so authors near the limit are not
+    switched on every subscription.
+    """
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    User.objects.filter(
+        pk=author_id, feed_pulled=True,
+        followers_count__lt=FEED_PUSH_LIMIT).update(feed_pulled=False)
+
+
+def get_feed(user, after=None, limit=None):
+    """
+    Function for getting (pub_date, id) of recipes from user's feed
+    placed after 'after' (pub_date, id) in descending order.
+    Entries of timeline are merged with recipes of followed authors
+    which were not fanned out, both are read by index.
+    """
+    def after_condition(ordering):
+        if after is None:
+            return Q()
+        return KeysetPagination.after(ordering, after)
+
+    ordering = ('-pub_date', '-recipe_id')
+    pushed = TimelineEntry.objects.filter(
+        after_condition(ordering), user=user,
+    ).order_by(*ordering).values_list('pub_date', 'recipe_id')[:limit]
+    ordering = ('-pub_date', '-id')
+    pulled = Recipe.objects.filter(
+        after_condition(ordering),
+        author__subscription_author__user=user,
+        fanned_out=False,
+    ).order_by(*ordering).values_list('pub_date', 'id')[:limit]
+    return sorted(set(pushed) | set(pulled), reverse=True)[:limit]
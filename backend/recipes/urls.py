@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from recipes import async_views
 from recipes.views import IngredientViewSet, RecipeViewSet, TagViewSet
 
 router = DefaultRouter()
@@ -11,3 +13,16 @@ router.register('ingredients', IngredientViewSet, basename='ingredients')
 
 urlpatterns = [
     path('', include(router.urls), name='api_recipes')]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = [
+        path('recipes/', async_views.recipes, name='recipes-list'),
+        path('recipes/<int:pk>/', async_views.recipe,
+             name='recipes-detail'),
+        path('tags/', async_views.tags, name='tags-list'),
+        path('tags/<int:pk>/', async_views.tag, name='tags-detail'),
+        path('ingredients/', async_views.ingredients,
+             name='ingredients-list'),
+        path('ingredients/<int:pk>/', async_views.ingredient,
+             name='ingredients-detail'),
+    ] + urlpatterns
@@ -1,44 +1,89 @@
-import io
-
-from django.db.models import Sum
-from django.http import FileResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Sum
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from foodgram.constants import (INGREDIENTS_SEARCH_LIMIT,
+                                RECOMMENDED_RECIPES_LIMIT)
+from recipes.catalogue import (INGREDIENTS, RECIPES, TAGS,
+                               get_ingredients_catalogue,
+                               get_recipe_ingredients_index,
+                               get_request_versions, get_version)
+from recipes.conditional import ConditionalGetMixin
 from recipes.filters import IngredientFilter, RecipeFilters
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
                             Tag)
-from recipes.pagination import PageNumberLimitPagination
+from recipes.pagination import PageNumberOrCursorPagination, TimelinePagination
 from recipes.permissions import AuthorOrReadOnly
+from recipes.renderers import (ShoppingCartCSVRenderer,
+                               ShoppingCartJSONRenderer,
+                               ShoppingCartPDFRenderer, ShoppingCartRenderer,
+                               ShoppingCartTXTRenderer)
+from recipes.response_cache import CachedListMixin
 from recipes.serializers import (FavoriteRecipeSerializer, IngredientInRecipe,
-                                 IngredientSerializer, RecipeCreateSerializer,
-                                 RecipeRetrieveSerializer,
+                                 IngredientSerializer,
+                                 RecipeCoverageSerializer,
+                                 RecipeCreateSerializer,
+                                 RecipeRetrieveSerializer, RecipeSerializer,
                                  ShoppingCartSerializer, TagSerializer)
+from recipes.timeline import get_feed
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, CachedListMixin,
+                    viewsets.ModelViewSet):
     """
     Class for viewing recipes.
     """
     queryset = Recipe.objects.all()
-    pagination_class = PageNumberLimitPagination
+    pagination_class = PageNumberOrCursorPagination
     permission_classes = (AuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilters
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve', 'popular', 'feed'):
+            return Recipe.objects.with_related(self.request.user)
+        return super().get_queryset()
+
+    @property
+    def cursor_ordering(self):
+        if self.action in ('popular', 'what_to_cook'):
+            return None
+        return ('-pub_date', 'id')
+
+    def get_version_stamp(self, request, *args, **kwargs):
+        """
+        Method for getting version of list from versions of recipes,
+        tags and ingredients without querying recipes. Lists have no
+        Last-Modified because deleting a recipe does not change it.
+        """
+        if self.action != 'retrieve':
+            return tuple(get_request_versions(
+                request, RECIPES, TAGS, INGREDIENTS)), None
+        try:
+            pk = int(kwargs[self.lookup_field])
+        except (TypeError, ValueError):
+            return None
+        updated_at = Recipe.objects.filter(pk=pk).values_list(
+            'updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        return (*get_request_versions(request, TAGS, INGREDIENTS),
+                updated_at.isoformat()), updated_at
+
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PATCH']:
             return RecipeCreateSerializer
         return RecipeRetrieveSerializer
 
+    @transaction.atomic
     def add_recipe(self, serializer_name, request, pk):
         """
         Method for adding recipe to Favorite or to Shopping Cart.
@@ -50,6 +95,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete_recipe(self, model, request, pk):
         """
         Method for deleting recipe from Favorite or from Shopping Cart.
@@ -71,53 +117,159 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.add_recipe(FavoriteRecipeSerializer, request, pk)
         return self.delete_recipe(FavoriteRecipe, request, pk)
 
-    def pdf_gen(self, ingredients_annotate):
+    def finalize_response(self, request, response, *args, **kwargs):
         """
-        Method for genereting pdf file which contant list of ingredients.
+        Method for rendering errors of shopping cart downloading in json.
         """
-        buf = io.BytesIO()
-        c = canvas.Canvas(buf, pagesize=letter, bottomup=0)
-        pdfmetrics.registerFont(
-            TTFont('FreeSans', 'recipes/fonts/FreeSans.ttf'))
-        textobj = c.beginText()
-        textobj.setTextOrigin(inch, inch)
-        textobj.setFont('FreeSans', 14)
-
-        ingredients_list = ['Cписок покупок:']
-
-        for i in ingredients_annotate:
-            ingredients_list.append(f"- {i['ingredient__name']} "
-                                    f"({i['ingredient__measurement_unit']}) - "
-                                    f"{i['sum_amount']}")
-        for obj in ingredients_list:
-            textobj.textLine(obj)
-
-        c.drawText(textobj)
-        c.showPage()
-        c.save()
-        buf.seek(0)
-
-        return buf
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        if (isinstance(response, Response) and response.exception
+                and isinstance(response.accepted_renderer,
+                               ShoppingCartRenderer)):
+            response.accepted_renderer = JSONRenderer()
+            response.accepted_media_type = JSONRenderer.media_type
+        return response
 
     @action(methods=['GET'], detail=False,
-            permission_classes=[permissions.IsAuthenticated])
+            permission_classes=[permissions.IsAuthenticated],
+            renderer_classes=[ShoppingCartPDFRenderer,
+                              ShoppingCartTXTRenderer,
+                              ShoppingCartCSVRenderer,
+                              ShoppingCartJSONRenderer])
     def download_shopping_cart(self, request):
         """
-        Method for downloading user's shopping cart in pdf format.
+        Method for downloading user's shopping cart.
+        Format is chosen with parameter 'format' or Accept header
+        (pdf, txt, csv, json), pdf is used by default.
         """
         ingredients_annotate = IngredientInRecipe.objects.filter(
             recipe__shopping_cart_recipe__user=request.user
-        ).values(
+        ).values_list(
             'ingredient__name', 'ingredient__measurement_unit'
         ).annotate(sum_amount=Sum('amount')).order_by('ingredient__name')
 
-        pdf_ingredients_list = self.pdf_gen(ingredients_annotate)
-
-        response = FileResponse(pdf_ingredients_list,
-                                as_attachment=True,
-                                filename='shopping_cart.pdf')
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients_annotate.iterator()),
+            content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{renderer.filename}"')
         return response
 
+    @action(methods=['GET'], detail=False,
+            permission_classes=[permissions.AllowAny])
+    def popular(self, request):
+        """
+        Method for getting recipes ordered by popularity.
+        Ranking is refreshed by command 'refresh_popular_recipes'.
+        """
+        recipes = self.filter_queryset(self.get_queryset().filter(
+            popularity__score__gt=0,
+        ).order_by('-popularity__score', '-pub_date'))
+        page = self.paginate_queryset(recipes)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @staticmethod
+    def get_ingredient_ids(request):
+        """
+        Method for getting ids of ingredients from parameter 'ingredients'
+        (repeated or separated by commas).
+        """
+        try:
+            ingredient_ids = {
+                int(ingredient_id)
+                for value in request.query_params.getlist('ingredients')
+                for ingredient_id in value.split(',') if ingredient_id}
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'Некорректный id ингредиента.'})
+        if not ingredient_ids:
+            raise ValidationError(
+                {'ingredients': 'Не указаны ингредиенты.'})
+        return ingredient_ids
+
+    @action(methods=['GET'], detail=False, url_path='what-to-cook',
+            permission_classes=[permissions.AllowAny])
+    def what_to_cook(self, request):
+        """
+        Method for getting recipes which can be cooked from ingredients
+        passed in parameter 'ingredients'. Recipes are ordered by share
+        of available ingredients and contain missing ingredients.
+        """
+        ingredient_ids = self.get_ingredient_ids(request)
+        ranked = get_recipe_ingredients_index().rank(ingredient_ids)
+        page = self.paginate_queryset(ranked)
+        recipes = Recipe.objects.prefetch_related(Prefetch(
+            'recipe_ingredients',
+            queryset=IngredientInRecipe.objects.select_related('ingredient'),
+        )).in_bulk([recipe_id for recipe_id, _, _ in page])
+        found = []
+        for recipe_id, count, total in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.coverage = count / total
+                found.append(recipe)
+        serializer = RecipeCoverageSerializer(
+            found, many=True,
+            context={'request': request, 'ingredients': ingredient_ids})
+        return self.get_paginated_response(serializer.data)
+
+    def get_timeline(self, after, limit):
+        return get_feed(self.request.user, after, limit)
+
+    @action(methods=['GET'], detail=False,
+            permission_classes=[permissions.IsAuthenticated])
+    def feed(self, request):
+        """
+        Method for getting recipes of followed authors, newest first.
+        Feed is paginated by parameter 'cursor'.
+        """
+        paginator = TimelinePagination()
+        page = paginator.paginate_queryset(
+            self.get_queryset(), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(methods=['GET'], detail=True,
+            permission_classes=[permissions.AllowAny])
+    def similar(self, request, pk):
+        """
+        Method for getting recipes similar to the recipe.
+        Similar recipes are built by command 'build_recommendations'.
+        """
+        recipes = Recipe.objects.filter(
+            similar_to__recipe_id=pk).order_by('-similar_to__score')
+        serializer = RecipeSerializer(
+            recipes, many=True, context={'request': request})
+        data = serializer.data
+        if not data:
+            get_object_or_404(Recipe, pk=pk)
+        return Response(data)
+
+    @action(methods=['GET'], detail=False,
+            permission_classes=[permissions.IsAuthenticated])
+    def recommended(self, request):
+        """
+        Method for getting recipes recommended to user.
+        Recommendations are built by command 'build_recommendations',
+        popular recipes are returned to users without recommendations.
+        """
+        recipes = list(Recipe.objects.filter(
+            recommended_for__user=request.user,
+        ).order_by('-recommended_for__score'))
+        if not recipes:
+            recipes = Recipe.objects.filter(
+                popularity__score__gt=0,
+            ).exclude(author=request.user).order_by(
+                '-popularity__score')[:RECOMMENDED_RECIPES_LIMIT]
+        serializer = RecipeSerializer(
+            recipes, many=True, context={'request': request})
+        return Response(serializer.data)
+
     @action(methods=['POST', 'DELETE'], detail=True)
     def shopping_cart(self, request, pk):
         """
@@ -128,16 +280,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.delete_recipe(ShoppingCart, request, pk)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     Class for viewing tags.
     """
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    user_dependent = False
+
+    def get_version_stamp(self, request, *args, **kwargs):
+        return (get_version(TAGS),), None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """
     Class for viewing ingredients.
     """
@@ -145,4 +302,46 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
+    user_dependent = False
+
+    def get_version_stamp(self, request, *args, **kwargs):
+        return (get_version(INGREDIENTS),), None
+
+    def list(self, request, *args, **kwargs):
+        if not settings.INGREDIENTS_CATALOGUE_CACHE:
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(
+            self.list_catalogue, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.INGREDIENTS_CATALOGUE_CACHE:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            self.retrieve_catalogue, request, *args, **kwargs)
+
+    def list_catalogue(self, request, *args, **kwargs):
+        """
+        Method for getting ingredients from ingredients catalogue.
+        """
+        catalogue = get_ingredients_catalogue()
+        name = request.query_params.get(
+            IngredientFilter.search_param, '').strip()
+        if not name:
+            return Response(catalogue.all(INGREDIENTS_SEARCH_LIMIT))
+        ranked = request.query_params.get(
+            IngredientFilter.mode_param) == 'ranked'
+        return Response(
+            catalogue.search(name, ranked, INGREDIENTS_SEARCH_LIMIT))
+
+    def retrieve_catalogue(self, request, *args, **kwargs):
+        """
+        Method for getting ingredient from ingredients catalogue.
+        """
+        try:
+            ingredient = get_ingredients_catalogue().get(
+                int(kwargs[self.lookup_field]))
+        except ValueError:
+            ingredient = None
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.5 on 2026-10-18 04:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_recipes_count(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    apps.get_model('users', 'User').objects.update(
+        recipes_count=Coalesce(Subquery(
+            Recipe.objects.filter(author=OuterRef('pk')).order_by()
+            .values('author').annotate(count=Count('pk'))
+            .values('count')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.RunPython(fill_recipes_count, migrations.RunPython.noop),
+    ]
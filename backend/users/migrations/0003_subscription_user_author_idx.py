@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['user', 'author'], name='subscription_user_author_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.5 on 2026-10-18 05:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_followers_count(apps, schema_editor):
+    Subscription = apps.get_model('users', 'Subscription')
+    apps.get_model('users', 'User').objects.update(
+        followers_count=Coalesce(Subquery(
+            Subscription.objects.filter(author=OuterRef('pk')).order_by()
+            .values('author').annotate(count=Count('pk'))
+            .values('count')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_subscription_user_author_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.RunPython(fill_followers_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_followers_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Рецепты не рассылаются по лентам подписчиков'),
+        ),
+    ]
@@ -25,6 +25,18 @@ class User(AbstractUser):
     password = models.CharField(
         verbose_name='Пароль',
         max_length=MAX_LENGHT)
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False)
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False)
+    feed_pulled = models.BooleanField(
+        verbose_name='Рецепты не рассылаются по лентам подписчиков',
+        default=False,
+        editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
@@ -58,6 +70,8 @@ class Subscription(models.Model):
             models.CheckConstraint(
                 check=(~Q(user=F('author'))),
                 name='myself_subscription')]
+        indexes = [models.Index(fields=['user', 'author'],
+                                name='subscription_user_author_idx')]
 
     def __str__(self) -> str:
         return f'{self.author.username}'
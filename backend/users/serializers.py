@@ -12,6 +12,8 @@ class UserRetrieveSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         '''Method for defining user's subscriptions.'''
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and Subscription.objects.filter(author=obj.id,
@@ -48,17 +50,20 @@ class SubscriptionRetrieveSerializer(UserRetrieveSerializer):
         '''
         Method for counting authozr's recipes.
         '''
-        return obj.recipe_author.count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
         """
         Method for getting author's recipes with parameter 'recipes_limit'.
         """
-        recipes = obj.recipe_author.all()
         request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+        if hasattr(obj, 'recipes_preview'):
+            recipes = obj.recipes_preview
+        else:
+            recipes = obj.recipe_author.all()
+            recipes_limit = request.GET.get('recipes_limit')
+            if recipes_limit:
+                recipes = recipes[:int(recipes_limit)]
         return SubscriptionRecipeSerializer(recipes, many=True,
                                             context={'request': request}).data
 
@@ -1,10 +1,12 @@
+from django.db.models import BooleanField, Prefetch, Value
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from recipes.pagination import PageNumberLimitPagination
+from recipes.models import Recipe
+from recipes.pagination import PageNumberOrCursorPagination
 from users.models import Subscription, User
 from users.serializers import (SubscriptionCreateSerializer,
                                SubscriptionRetrieveSerializer,
@@ -17,14 +19,44 @@ class UserViewSet(DjoserUserViewSet):
     """
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
-    pagination_class = PageNumberLimitPagination
+    pagination_class = PageNumberOrCursorPagination
     serializer_class = UserRetrieveSerializer
+    cursor_ordering = ('username', 'id')
 
     def get_permissions(self):
         if self.action == 'me':
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
 
+    @staticmethod
+    def get_recipes_limit(request):
+        """
+        Method for getting parameter 'recipes_limit' from request.
+        """
+        try:
+            recipes_limit = int(request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return None
+        return recipes_limit if recipes_limit >= 0 else None
+
+    def get_subscriptions_queryset(self, authors):
+        """
+        Method for prefetching authors' latest recipes limited by
+        'recipes_limit'.
+        Sliced prefetch is limited per author with a window function,
+        so the page is fetched in a fixed number of queries.
+        """
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time', 'author_id', 'pub_date')
+        recipes_limit = self.get_recipes_limit(self.request)
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
+        return authors.annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(Prefetch(
+            'recipe_author', queryset=recipes, to_attr='recipes_preview'),
+        ).order_by(*User._meta.ordering)
+
     @action(methods=['GET'], detail=False,
             permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
@@ -32,8 +64,8 @@ class UserViewSet(DjoserUserViewSet):
         Method for getting current user's subscriptions.
         """
         user = request.user
-        subscriptions = User.objects.filter(
-            subscription_author__user=user)
+        subscriptions = self.get_subscriptions_queryset(
+            User.objects.filter(subscription_author__user=user))
         subscriptions_page = self.paginate_queryset(subscriptions)
         serializer = SubscriptionRetrieveSerializer(
             subscriptions_page, context={'request': request}, many=True)
@@ -53,6 +85,8 @@ class UserViewSet(DjoserUserViewSet):
                 data={'user': user.id, 'author': author.id})
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            author = self.get_subscriptions_queryset(
+                User.objects.filter(id=author.id)).get()
             serializer = SubscriptionRetrieveSerializer(
                 author, context={'request': request},
             )
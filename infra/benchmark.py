@@ -0,0 +1,123 @@
+"""
+Load test of read endpoints of Foodgram API.
+
+Sends GET requests to the given paths from several threads for a fixed
+time and prints throughput and latency percentiles for every path.
+Only standard library is used so script runs anywhere, e.g.:
+
+    python benchmark.py http://localhost:8000 /api/recipes/ /api/tags/ \
+        --concurrency 32 --duration 30
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?tags=breakfast&limit=6',
+    '/api/recipes/1/',
+    '/api/tags/',
+    '/api/ingredients/?name=мол',
+)
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def worker(base, paths, headers, deadline, results, number):
+    """
+    Function for sending requests over one keep-alive connection until
+    deadline. Latencies are saved to 'results' by path.
+    """
+    connection_class = (http.client.HTTPSConnection
+                        if base.scheme == 'https'
+                        else http.client.HTTPConnection)
+    connection = connection_class(base.netloc, timeout=30)
+    prefix = base.path.rstrip('/')
+    latencies = {path: [] for path in paths}
+    errors = 0
+    while time.perf_counter() < deadline:
+        path = paths[number % len(paths)]
+        number += 1
+        start = time.perf_counter()
+        try:
+            connection.request(
+                'GET', quote(prefix + path, safe='/?&='), headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            continue
+        if response.status != 200:
+            errors += 1
+            continue
+        latencies[path].append(time.perf_counter() - start)
+    connection.close()
+    results.append((latencies, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('url', help='Base url of server.')
+    parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS,
+                        help='Paths requested in turn.')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Number of parallel connections.')
+    parser.add_argument('--duration', type=float, default=30,
+                        help='Duration of test in seconds.')
+    parser.add_argument('--warmup', type=float, default=5,
+                        help='Duration of warmup in seconds.')
+    parser.add_argument('--token', help='Token of authenticated user.')
+    args = parser.parse_args()
+
+    base = urlsplit(args.url)
+    headers = {'Accept': 'application/json'}
+    if args.token:
+        headers['Authorization'] = f'Token {args.token}'
+    paths = list(args.paths)
+
+    def run(duration):
+        results = []
+        deadline = time.perf_counter() + duration
+        threads = [
+            threading.Thread(target=worker, args=(
+                base, paths, headers, deadline, results, number))
+            for number in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    if args.warmup:
+        run(args.warmup)
+    results = run(args.duration)
+
+    errors = sum(thread_errors for _, thread_errors in results)
+    total = []
+    print(f'{"path":<45} {"rps":>8} {"p50 ms":>8} {"p99 ms":>8}')
+    for path in paths:
+        latencies = sorted(
+            latency for thread_latencies, _ in results
+            for latency in thread_latencies[path])
+        total.extend(latencies)
+        print(f'{path:<45} {len(latencies) / args.duration:>8.1f} '
+              f'{statistics.median(latencies or [0]) * 1000:>8.1f} '
+              f'{percentile(latencies, 99) * 1000:>8.1f}')
+    total.sort()
+    print(f'{"total":<45} {len(total) / args.duration:>8.1f} '
+          f'{statistics.median(total or [0]) * 1000:>8.1f} '
+          f'{percentile(total, 99) * 1000:>8.1f}')
+    print(f'errors: {errors}')
+
+
+if __name__ == '__main__':
+    main()